@@ -1,20 +1,15 @@
-import json
+import os
 import geopandas as gpd
-import topojson as tp
 from pathlib import Path
+from typing import Optional
 from shapely.geometry import Point
 import pandas as pd
 
-from utils.loading_funcs import read_csv_data
+from utils.loading_funcs import load_bydeler_geodata
+from utils.parallel import map_partitions
+from utils.storage import STAGE_PATHS, read_stage, write_stage
 
-def load_in_bydeler_geopandas(path_to_data: Path) -> gpd.GeoDataFrame:
-    with open(path_to_data, 'r', encoding='utf-8') as f:
-        topo_data = json.load(f)
-
-    topology = tp.Topology(topo_data, object_name='Bydeler')
-    gdf = topology.to_gdf()
-    gdf = gdf.set_crs('EPSG:4326', allow_override=True)
-    return gdf
+BYDEL_COLUMNS = ['BYDELSNAVN', 'BYDEL', 'Kombinert']
 
 def find_bydel(lat: float, lon: float, gdf: gpd.GeoDataFrame):
     point = Point(lon, lat)
@@ -49,14 +44,41 @@ def allocate_bydel_to_data(df, gdf: gpd.GeoDataFrame):
     df = pd.concat([df.reset_index(drop=True), bydel_df.reset_index(drop=True)], axis=1)
     return df
 
+def allocate_bydel_to_unique_locations(locations: pd.DataFrame, gdf: gpd.GeoDataFrame) -> pd.DataFrame:
+    """Match unique (latitude, longitude) pairs against the bydel polygons through their spatial index."""
+    result = locations[['latitude', 'longitude']].reset_index(drop=True)
+    points = gpd.points_from_xy(result['longitude'], result['latitude'], crs='EPSG:4326')
+    if gdf.crs is not None and points.crs != gdf.crs:
+        points = points.to_crs(gdf.crs)
+    point_idx, polygon_idx = gdf.sindex.query(points, predicate='within')
+    # Keep the first matching polygon per point, as find_bydel does
+    first_polygon = pd.Series(polygon_idx).groupby(point_idx).min()
+    matches = gdf[BYDEL_COLUMNS].astype(object).iloc[first_polygon.to_numpy()]
+    return result.join(matches.set_axis(first_polygon.index))
+
+def allocate_bydel_to_data_vectorized(df: pd.DataFrame, gdf: gpd.GeoDataFrame) -> pd.DataFrame:
+    """Allocate bydel per row by joining each unique location once and broadcasting the result."""
+    df = df.reset_index(drop=True)
+    has_location = df['latitude'].notnull() & df['longitude'].notnull()
+    locations = df.loc[has_location, ['latitude', 'longitude']].drop_duplicates()
+    bydel_per_location = allocate_bydel_to_unique_locations(locations, gdf)
+    bydel_df = df[['latitude', 'longitude']].merge(bydel_per_location, on=['latitude', 'longitude'], how='left')
+    bydel_df = bydel_df[BYDEL_COLUMNS].infer_objects()
+    df = pd.concat([df, bydel_df], axis=1)
+    return df
+
+
+def main(max_workers: Optional[int] = None):
+    """Allocate bydel to the geo stage in this process, or in a pool of max_workers processes.
 
-def main():
-    path_to_electricity_file = Path(__file__).parent / 'data' / 'stromforbruk_with_geo.csv'
+    The pool is opt-in: max_workers defaults to the BYDEL_WORKERS environment variable, else 1.
+    """
+    max_workers = max_workers or int(os.environ.get('BYDEL_WORKERS', 1))
     path_to_bydel_topojson = Path(__file__).parent / 'data' / 'Bydeler_Oslo_m_marka.json'
-    electricity_df = read_csv_data(path_to_electricity_file)
-    bydel_gdf = load_in_bydeler_geopandas(path_to_bydel_topojson)
-    df = allocate_bydel_to_data(electricity_df, bydel_gdf)
-    df.to_csv(Path(__file__).parent / 'data' / 'stromforbruk_with_bydel.csv', index=False)
+    electricity_df = read_stage(STAGE_PATHS['geo'])
+    bydel_gdf = load_bydeler_geodata(path_to_bydel_topojson)
+    df = map_partitions(electricity_df, allocate_bydel_to_data_vectorized, bydel_gdf, max_workers=max_workers)
+    write_stage(df, STAGE_PATHS['bydel'])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
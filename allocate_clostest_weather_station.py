@@ -1,34 +1,134 @@
 import json 
 from pathlib import Path
+from typing import List, Optional
 from api_connections.weather_api_connection import WeatherAPIConnection
 import os
+import numpy as np
+import pandas as pd
 from dotenv import load_dotenv
 
 load_dotenv()
 
+EARTH_RADIUS_KM = 6371.0088
+
 def read_json(file_path: Path) -> dict:
     with open(file_path, 'r') as f:
         return json.load(f)
-    
 
-def allocate_closest_weather_station(address_geo_locations: dict, weather_stations: dict) -> dict:
+
+def to_unit_sphere(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """Convert degrees to 3D points on the unit sphere, where chord length is monotonic in great-circle distance."""
+    lat = np.radians(np.asarray(latitudes, dtype=float))
+    lon = np.radians(np.asarray(longitudes, dtype=float))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in kilometres."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=float)) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def km_to_chord(distance_km: float) -> float:
+    return 2 * np.sin(distance_km / (2 * EARTH_RADIUS_KM))
+
+
+class WeatherStationIndex:
+    """Nearest-neighbour index over Frost weather stations, built once per get_sources response."""
+
+    def __init__(self, station_ids: List[str], latitudes: np.ndarray, longitudes: np.ndarray):
+        self.station_ids = np.asarray(station_ids, dtype=object)
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        # scipy is imported here so that importing this module stays cheap
+        from scipy.spatial import cKDTree
+        self.tree = cKDTree(to_unit_sphere(self.latitudes, self.longitudes))
+
+    @classmethod
+    def from_sources(cls, weather_stations: dict) -> "WeatherStationIndex":
+        stations = [s for s in weather_stations.get('data', []) if 'geometry' in s]
+        return cls(
+            station_ids=[s['id'] for s in stations],
+            latitudes=[s['geometry']['coordinates'][1] for s in stations],
+            longitudes=[s['geometry']['coordinates'][0] for s in stations],
+        )
+
+    def __len__(self) -> int:
+        return len(self.station_ids)
+
+    def query(self, latitudes, longitudes, k: int = 1, max_distance_km: Optional[float] = None) -> pd.DataFrame:
+        """Find the k nearest stations per point, optionally limited to max_distance_km.
+
+        Returns one row per (point, rank) with the great-circle distance. Points without
+        coordinates or without a station in range get a missing station_id.
+        """
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        # Without stations each point still gets one row, with a missing station_id
+        k = max(min(k, len(self)), 1)
+        n_points = len(latitudes)
+        valid = ~(np.isnan(latitudes) | np.isnan(longitudes))
+
+        station_idx = np.full((n_points, k), len(self), dtype=np.intp)
+        if valid.any() and len(self) > 0:
+            upper_bound = km_to_chord(max_distance_km) if max_distance_km is not None else np.inf
+            _, idx = self.tree.query(
+                to_unit_sphere(latitudes[valid], longitudes[valid]), k=k, distance_upper_bound=upper_bound
+            )
+            station_idx[valid] = np.asarray(idx).reshape(-1, k)
+
+        station_idx = station_idx.ravel()
+        found = station_idx < len(self)
+        found_idx = station_idx[found]
+        point_idx = np.repeat(np.arange(n_points), k)
+
+        station_id = np.full(station_idx.shape, None, dtype=object)
+        station_lat = np.full(station_idx.shape, np.nan)
+        station_lon = np.full(station_idx.shape, np.nan)
+        station_id[found] = self.station_ids[found_idx]
+        station_lat[found] = self.latitudes[found_idx]
+        station_lon[found] = self.longitudes[found_idx]
+
+        return pd.DataFrame({
+            'point': point_idx,
+            'rank': np.tile(np.arange(1, k + 1), n_points),
+            'station_id': station_id,
+            'station_lat': station_lat,
+            'station_lon': station_lon,
+            'distance_km': haversine_km(latitudes[point_idx], longitudes[point_idx], station_lat, station_lon),
+        })
+
+    def query_radius(self, latitude: float, longitude: float, radius_km: float) -> pd.DataFrame:
+        """All stations within radius_km of a single point, sorted by distance."""
+        idx = np.asarray(self.tree.query_ball_point(to_unit_sphere([latitude], [longitude])[0], km_to_chord(radius_km)), dtype=np.intp)
+        result = pd.DataFrame({
+            'station_id': self.station_ids[idx],
+            'station_lat': self.latitudes[idx],
+            'station_lon': self.longitudes[idx],
+            'distance_km': haversine_km(latitude, longitude, self.latitudes[idx], self.longitudes[idx]),
+        })
+        return result.sort_values('distance_km', ignore_index=True)
+
+
+def allocate_closest_weather_station(address_geo_locations: dict, weather_stations: dict, max_distance_km: Optional[float] = None) -> dict:
+    station_index = WeatherStationIndex.from_sources(weather_stations)
+    addresses = list(address_geo_locations)
+    latitudes = [address_geo_locations[a]['latitude'] for a in addresses]
+    longitudes = [address_geo_locations[a]['longitude'] for a in addresses]
+    nearest = station_index.query(
+        np.array(latitudes, dtype=float), np.array(longitudes, dtype=float), k=1, max_distance_km=max_distance_km
+    )
+
     allocated_stations = {}
-    for address, coords in address_geo_locations.items():
-        min_distance = float('inf')
-        closest_station_id = None
-        for station in weather_stations.get('data', []):
-            if 'geometry' not in station:
-                continue
-            station_id = station['id']
-            station_lat = station['geometry']['coordinates'][1]
-            station_lon = station['geometry']['coordinates'][0]
-            if coords['latitude'] is None or coords['longitude'] is None:
-                continue
-            distance = ((float(coords['latitude']) - station_lat) ** 2 + (float(coords['longitude']) - station_lon) ** 2) ** 0.5
-            if distance < min_distance:
-                min_distance = distance
-                closest_station_id = station_id
-        allocated_stations[address] = {"station_id": closest_station_id, "station_location": (station_lat, station_lon), "address_location": (coords['latitude'], coords['longitude'])}
+    for address, lat, lon, row in zip(addresses, latitudes, longitudes, nearest.itertuples(index=False)):
+        has_station = pd.notnull(row.station_id)
+        allocated_stations[address] = {
+            "station_id": row.station_id if has_station else None,
+            "station_location": (row.station_lat, row.station_lon) if has_station else None,
+            "address_location": (lat, lon),
+            "distance_km": float(row.distance_km) if has_station else None,
+        }
     return allocated_stations
 
 def main():
@@ -43,4 +143,4 @@ def main():
         json.dump(allocated_stations, f, indent=4)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,50 +1,61 @@
 from pathlib import Path
-from OSMPythonTools.nominatim import Nominatim
+from typing import Callable, Optional, Union
+import numpy as np
 import pandas as pd
 import json
 
+from utils.loading_funcs import read_stromforbruk_csv
+from utils.geocoding import Coordinates, GeocodingCache, resolve_addresses
+from utils.storage import STAGE_PATHS, write_stage
+
+GEOCODING_CACHE_PATH = Path('data/geocoding_cache.sqlite')
 
-def read_csv_data(file_path: str) -> pd.DataFrame:
-    """Read electricity consumption data from a CSV file."""
-    return pd.read_csv(file_path, engine='python', sep=';', decimal='.')
 
 def read_json(file_path: Path) -> pd.DataFrame:
     with open(file_path, 'r') as f:
         return json.load(f)
 
-def get_location_info_per_address(df: pd.DataFrame) -> dict:
+def get_location_info_per_address(
+    df: pd.DataFrame,
+    cache_path: Path = GEOCODING_CACHE_PATH,
+    geocode: Optional[Callable[[str], Coordinates]] = None,
+) -> dict:
     """Allocate geographical locations to electricity consumption data."""
-    nominatim = Nominatim()
-    location_geo_info = {}
-    
-    for address in df['addresse'].unique():
-        location = nominatim.query(f"{address}, Oslo, Norway")
-        if location.toJSON():
-            location_geo_info[address] = {
-                'latitude': float(location.toJSON()[0]['lat']),
-                'longitude': float(location.toJSON()[0]['lon'])
-            }
-        else:
-            location_geo_info[address] = {
-                'latitude': None,
-                'longitude': None
-            }
-    return location_geo_info
-
-def allocate_location_to_el_data(df: pd.DataFrame, geo_locations: dict) -> pd.DataFrame:
+    cache = GeocodingCache(cache_path)
+    try:
+        coordinates = resolve_addresses(df['addresse'].dropna().unique(), cache, geocode=geocode)
+    finally:
+        cache.close()
+    return {
+        address: {'latitude': lat, 'longitude': lon}
+        for address, (lat, lon) in coordinates.items()
+    }
+
+def geo_lookup_table(geo_locations: dict) -> pd.DataFrame:
+    """Geo locations per address as a float frame indexed by addresse."""
+    lookup = pd.DataFrame.from_dict(geo_locations, orient='index', columns=['latitude', 'longitude'])
+    return lookup.astype(float)
+
+def allocate_location_to_el_data(df: pd.DataFrame, geo_locations: Union[dict, pd.DataFrame]) -> pd.DataFrame:
     """Add geographical location data to the electricity consumption DataFrame."""
-    df['latitude'] = df['addresse'].apply(lambda addr: geo_locations.get(addr, {}).get('latitude'))
-    df['longitude'] = df['addresse'].apply(lambda addr: geo_locations.get(addr, {}).get('longitude'))
+    lookup = geo_locations if isinstance(geo_locations, pd.DataFrame) else geo_lookup_table(geo_locations)
+    # Look up each distinct address once and broadcast through the category codes
+    addresses = df['addresse'].astype('category')
+    coordinates = lookup.reindex(addresses.cat.categories)[['latitude', 'longitude']].to_numpy(dtype=float)
+    # Code -1 (missing addresse) picks the trailing NaN row
+    coordinates = np.vstack([coordinates, [np.nan, np.nan]])
+    df['latitude'], df['longitude'] = coordinates[addresses.cat.codes.to_numpy()].T
     return df
 
 
 def main():
     data_file = Path('data/stromforbruk.csv')
-    df = read_csv_data(data_file)
+    df = read_stromforbruk_csv(data_file)
     geo_locations_per_address = get_location_info_per_address(df)
-    geo_locations_per_address = read_json(Path('data/address_geo_locations.json'))
+    with open(Path('data/address_geo_locations.json'), 'w') as f:
+        json.dump(geo_locations_per_address, f, indent=4)
     electricity_location_data = allocate_location_to_el_data(df, geo_locations_per_address)
-    electricity_location_data.to_csv(Path('data/stromforbruk_with_geo.csv'), index=False)
+    write_stage(electricity_location_data, STAGE_PATHS['geo'])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
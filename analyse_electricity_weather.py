@@ -1,16 +1,28 @@
 import json
 from pathlib import Path
 from api_connections.weather_api_connection import WeatherAPIConnection
+from api_connections.observation_cache import ObservationCache
+from api_connections.frost_parsing import flatten_observations, pivot_observations
 import os
 from dotenv import load_dotenv
 import pandas as pd
 import matplotlib.pyplot as plt
+from typing import Dict, List, Optional
 
-from exploratory_analysis import clean_data_from_outliers, remove_negative_values
+from utils.consumption_cube import CUBE_PATH, load_cube
+from utils.correlation import correlation_table, monthly_consumption_matrix
+from utils.storage import output_file
+from utils.weather_join import StationWeather, attach_nearest_station, attach_station_weather
+
+from utils.visualisation_funcs import finish_figure
 
 load_dotenv()
 
-def plot_monthly_average_consumption_vs_weather(monthly_avg: pd.DataFrame, type_of_weather: str):
+def plot_monthly_average_consumption_vs_weather(
+    monthly_avg: pd.DataFrame,
+    type_of_weather: str,
+    output_path: Optional[str] = None,
+) -> plt.Figure:
        # Create scatter plot
     fig, ax = plt.subplots(figsize=(12, 8))
 
@@ -25,7 +37,7 @@ def plot_monthly_average_consumption_vs_weather(monthly_avg: pd.DataFrame, type_
                         linewidth=0.5)
 
     # Colorbar
-    cbar = plt.colorbar(scatter, ax=ax, ticks=range(1, 13))
+    cbar = fig.colorbar(scatter, ax=ax, ticks=range(1, 13))
     cbar.set_label('Måned', fontsize=12, fontweight='bold')
     cbar.ax.set_yticklabels(['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 
                             'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'])
@@ -50,98 +62,110 @@ def plot_monthly_average_consumption_vs_weather(monthly_avg: pd.DataFrame, type_
             verticalalignment='top',
             bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
 
-    plt.tight_layout()
-    plt.savefig(f'belysning_vs_{type_of_weather}_scatter.png', dpi=300, bbox_inches='tight')
-    plt.show()
-
     print(f"\n✓ Korrelasjon: {correlation:.3f}")
+    return finish_figure(fig, output_path or f'belysning_vs_{type_of_weather}_scatter.png')
 
 
-def transform_date_to_period(dataframe: pd.DataFrame):
-    dato_dt = pd.to_datetime(dataframe['dato'])
-    dataframe['year_month'] = dato_dt.dt.to_period('M')
-    dataframe['month'] = dato_dt.dt.month
-    return dataframe
-
 def read_json(file_path: Path) -> dict:
     with open(file_path, 'r') as f:
         return json.load(f) 
 
-def weather_data_to_dataframe(response: dict) -> pd.DataFrame:
-    rows = []
-
-    for item in response["data"]:
-        date = pd.to_datetime(item["referenceTime"])
-        # Fjern timezone før konvertering til Period
-        date = date.tz_localize(None) if date.tz else date
-        month_period = date.to_period("M")
-        month_num = date.month
-
-
-        # Hent verdier EN gang per item (ikke inne i loop)
-        mean_air_temp = next((o['value'] for o in item["observations"] 
-                             if (o["elementId"] == "mean(air_temperature P1M)") 
-                             and (o.get("timeOffset") == "PT6H")), None)
-        
-        min_air_temp = next((o['value'] for o in item["observations"] 
-                            if o["elementId"] == "min(air_temperature P1M)"), None)
-        
-        max_air_temp = next((o['value'] for o in item["observations"] 
-                            if o["elementId"] == "max(air_temperature P1M)"), None)
-        
-        cloud_area_fraction = next((o['value'] for o in item["observations"] 
-                                   if o["elementId"] == "mean(cloud_area_fraction P1M)"), None)
-
-        # Legg til EN rad per måned
-        rows.append({
-            "year_month": month_period,
-            "month": month_num,
-            "mean_air_temp": mean_air_temp,
-            "min_air_temp": min_air_temp,
-            "max_air_temp": max_air_temp,
-            "cloud_area_fraction": cloud_area_fraction,
-        })
-
-    return pd.DataFrame(rows)
+MONTHLY_ELEMENTS = [
+    'mean(air_temperature P1M)',
+    'max(air_temperature P1M)',
+    'min(air_temperature P1M)',
+    'mean(cloud_area_fraction P1M)',
+]
+
+MONTHLY_COLUMN_NAMES = {
+    'mean(air_temperature P1M)': 'mean_air_temp',
+    'min(air_temperature P1M)': 'min_air_temp',
+    'max(air_temperature P1M)': 'max_air_temp',
+    'mean(cloud_area_fraction P1M)': 'cloud_area_fraction',
+}
+
+MONTHLY_TIME_OFFSETS = {'mean(air_temperature P1M)': 'PT6H'}
+
+# Blindern, used for addresses without an allocated station
+DEFAULT_STATION = 'SN18700'
+STATION_ALLOCATION_PATH = Path('data/address_closest_weather_stations.json')
+CORRELATION_TABLE = 'korrelasjon_kategori_bydel_vaer.csv'
+
+
+def weather_data_to_dataframe(
+    response: dict,
+    elements: Optional[List[str]] = None,
+    time_offsets: Optional[Dict[str, str]] = None,
+    column_names: Optional[Dict[str, str]] = None,
+    period_freq: str = 'M',
+    period_column: str = 'year_month',
+) -> pd.DataFrame:
+    """Parse a Frost observations response to one row per source and reference time.
+
+    Defaults reproduce the monthly columns used in this analysis. For other
+    resolutions pass the element list and period_freq, e.g. 'D' for P1D or 'h' for PT1H.
+    """
+    if elements is None:
+        elements = MONTHLY_ELEMENTS
+        time_offsets = MONTHLY_TIME_OFFSETS if time_offsets is None else time_offsets
+        column_names = MONTHLY_COLUMN_NAMES if column_names is None else column_names
+    observations = flatten_observations(response.get('data', []))
+    weather_df = pivot_observations(observations, elements, time_offsets, column_names)
+    weather_df[period_column] = weather_df['referenceTime'].dt.to_period(period_freq)
+    weather_df['month'] = weather_df['referenceTime'].dt.month
+    return weather_df
+
+
+def monthly_average_with_weather(cells: pd.DataFrame, weather_columns: List[str]) -> pd.DataFrame:
+    """Average consumption per month, with each weather column weighted by the readings it was joined to."""
+    weighted = cells[weather_columns].mul(cells['count'], axis=0)
+    weights = cells[weather_columns].notna().mul(cells['count'], axis=0)
+    keys = [cells['year'], cells['month']]
+    monthly = weighted.groupby(keys).sum() / weights.groupby(keys).sum()
+    totals = cells.groupby(['year', 'month'])[['sum', 'count']].sum()
+    monthly['forbruk_kwh'] = totals['sum'] / totals['count']
+    monthly = monthly.reset_index()
+    monthly['year_month'] = pd.to_datetime(monthly[['year', 'month']].assign(day=1)).dt.to_period('M')
+    return monthly
 
 
 def main():
-    weater_connector = WeatherAPIConnection(
+    allocated_stations = read_json(STATION_ALLOCATION_PATH) if STATION_ALLOCATION_PATH.exists() else {}
+    belysning_cells = load_cube(CUBE_PATH, columns=['addresse', 'year', 'month', 'sum', 'count'],
+                                filters=[('kategori', '==', 'Belysning')])
+    belysning_cells = attach_nearest_station(belysning_cells, allocated_stations, default_station=DEFAULT_STATION)
+    belysning_cells['month_start'] = pd.to_datetime(belysning_cells[['year', 'month']].assign(day=1))
+
+    with ObservationCache(Path('data/frost_observations.sqlite')) as cache, WeatherAPIConnection(
         client_id=os.getenv("FROST_CLIENT_ID"),  # Replace with your actual client ID
-        client_secret=os.getenv("FROST_CLIENT_SECRET")  # Replace with your actual client secret
-    )
-    strom_forbruk = pd.read_csv('data/stromforbruk_with_geo.csv', engine='python')
-    strom_forbruk = remove_negative_values(strom_forbruk)
-    strom_forbruk = clean_data_from_outliers(strom_forbruk)
-    strom_forbruk = transform_date_to_period(strom_forbruk)
-    belysning_df = strom_forbruk[strom_forbruk['kategori'] == 'Belysning'].copy()
-
-
-    weater_data = weater_connector.get_weather_data(
-            sources=['SN18700'],
-            elements=[
-                'mean(air_temperature P1M)', 
-                'max(air_temperature P1M)', 
-                'min(air_temperature P1M)', 
-                'mean(cloud_area_fraction P1M)'            
-            ],
-            start_time='2014-01-01',
-            end_time='2022-12-31')
+        client_secret=os.getenv("FROST_CLIENT_SECRET"),  # Replace with your actual client secret
+        cache=cache,
+    ) as weater_connector:
+        weater_data = weater_connector.get_weather_data(
+                sources=list(belysning_cells['station_id'].cat.categories),
+                elements=MONTHLY_ELEMENTS,
+                start_time='2014-01-01',
+                end_time='2022-12-31')
     weather_df = weather_data_to_dataframe(weater_data)
 
-    merged_df = belysning_df.merge(weather_df, on='year_month', how='left', suffixes=('', '_weather'))
-    monthly_avg = merged_df.groupby('year_month').agg({
-        'forbruk_kwh': 'mean',
-        'mean_air_temp': 'first',
-        'cloud_area_fraction': 'first',
-        'month': 'first'
-    }).reset_index()
+    # Hver adresse får været fra sin nærmeste stasjon for samme måned
+    weather_columns = ['mean_air_temp', 'cloud_area_fraction']
+    station_weather = StationWeather(weather_df, weather_columns, period_freq='M')
+    belysning_cells = attach_station_weather(belysning_cells, station_weather, 'month_start')
+    monthly_avg = monthly_average_with_weather(belysning_cells, weather_columns)
 
     # Remove any NaN values
     monthly_avg = monthly_avg.dropna(subset=['forbruk_kwh', 'mean_air_temp', 'cloud_area_fraction'])
     plot_monthly_average_consumption_vs_weather(monthly_avg, 'mean_air_temp')
     plot_monthly_average_consumption_vs_weather(monthly_avg, 'cloud_area_fraction')
 
+    # Korrelasjon for alle kategori x bydel mot hvert værelement, med 0-3 måneders forsinkelse
+    cube = load_cube(CUBE_PATH, columns=['kategori', 'BYDELSNAVN', 'year', 'month', 'sum', 'count', 'min', 'max'])
+    weather_matrix = monthly_avg.set_index('year_month')[weather_columns]
+    correlations = correlation_table(monthly_consumption_matrix(cube), weather_matrix, lags=range(4))
+    correlations.to_csv(output_file(CORRELATION_TABLE), index=False)
+    print(correlations.sort_values('pearson_p').head(10).to_string(index=False))
+
  
 
 
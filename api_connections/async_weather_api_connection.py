@@ -0,0 +1,132 @@
+import asyncio
+import base64
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+import aiohttp
+import pandas as pd
+
+from api_connections.frost_parsing import flatten_observations
+from api_connections.weather_api_connection import RETRY_STATUS_CODES, split_time_range
+
+RequestKey = Tuple[str, Tuple[str, ...], str, str]
+
+
+class AsyncWeatherAPIConnection:
+    """asyncio variant of WeatherAPIConnection for many stations x elements x time windows.
+
+    All requests share one aiohttp connection pool and at most max_concurrency are in
+    flight. Identical (source, elements, window) requests are coalesced while in flight:
+    they share one task, which is dropped once it finishes, so results are not kept
+    for the lifetime of the connection and a later identical request fetches again.
+
+    Usage:
+        async with AsyncWeatherAPIConnection(client_id, client_secret) as connection:
+            async for df in connection.iter_weather_data(sources, elements, start, end):
+                ...
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        max_concurrency: int = 10,
+        timeout: float = 60,
+        max_retries: int = 5,
+        backoff_factor: float = 1.0,
+        base_url: str = "https://frost.met.no",
+    ):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._requests: Dict[RequestKey, asyncio.Task] = {}
+
+    async def __aenter__(self) -> "AsyncWeatherAPIConnection":
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+            headers={'Accept': 'application/json', 'Authorization': self._basic_auth_header()},
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self
+
+    def _basic_auth_header(self) -> str:
+        credentials = f"{self.client_id or ''}:{self.client_secret or ''}".encode()
+        return f"Basic {base64.b64encode(credentials).decode('ascii')}"
+
+    async def __aexit__(self, *exc) -> None:
+        for task in self._requests.values():
+            task.cancel()
+        self._requests.clear()
+        await self.session.close()
+
+    async def _get_page(self, url: str, params: Optional[dict] = None) -> dict:
+        """GET with retry and exponential backoff on 429/5xx; 404 means no data."""
+        for attempt in range(self.max_retries + 1):
+            async with self._semaphore:
+                async with self.session.get(url, params=params) as response:
+                    if response.status == 404:
+                        return {'data': []}
+                    if response.status not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                        response.raise_for_status()
+                        return await response.json(content_type=None)
+                    retry_after = response.headers.get('Retry-After')
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else self.backoff_factor * 2 ** attempt
+            await asyncio.sleep(delay)
+
+    async def _get(self, endpoint: str, params: dict) -> dict:
+        """GET a Frost endpoint, following nextLink pages and merging their data lists."""
+        result = await self._get_page(endpoint, params)
+        next_link = result.get('nextLink')
+        while next_link:
+            page = await self._get_page(next_link)
+            result.setdefault('data', []).extend(page.get('data', []))
+            next_link = page.get('nextLink')
+        result.pop('nextLink', None)
+        return result
+
+    def fetch(self, source: str, elements: Iterable[str], window_start: str, window_end: str) -> asyncio.Task:
+        """Task for one (source, elements, window) request, shared with identical requests in flight."""
+        elements = tuple(sorted(elements))
+        key = (source, elements, window_start, window_end)
+        if key not in self._requests:
+            params = {
+                'sources': source,
+                'elements': ','.join(elements),
+                'referencetime': f"{window_start}/{window_end}",
+            }
+            task = asyncio.ensure_future(self._get(f"{self.base_url}/observations/v0.jsonld", params))
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self._requests[key] = task
+        return self._requests[key]
+
+    def _forget(self, key: RequestKey, task: asyncio.Task) -> None:
+        # Finished tasks are dropped: results are not held in memory, and a transient
+        # timeout or 5xx is not replayed to later identical requests
+        if self._requests.get(key) is task:
+            del self._requests[key]
+
+    async def iter_weather_data(
+        self,
+        sources: List[str],
+        elements: List[str],
+        start_time: str,
+        end_time: str,
+        window: pd.DateOffset = pd.DateOffset(years=1),
+    ) -> AsyncIterator[pd.DataFrame]:
+        """Yield one observations DataFrame per (source, window) as soon as it arrives."""
+        tasks = {
+            self.fetch(source, elements, window_start, window_end)
+            for source in dict.fromkeys(sources)
+            for window_start, window_end in split_time_range(start_time, end_time, window)
+        }
+        for completed in asyncio.as_completed(tasks):
+            yield flatten_observations((await completed).get('data', []))
+
+    async def get_weather_data(self, sources: List[str], elements: List[str], start_time: str, end_time: str, **kwargs) -> pd.DataFrame:
+        frames = [df async for df in self.iter_weather_data(sources, elements, start_time, end_time, **kwargs)]
+        return pd.concat(frames, ignore_index=True)
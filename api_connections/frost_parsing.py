@@ -0,0 +1,154 @@
+import codecs
+import json
+from typing import Dict, Iterable, Iterator, List, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+OBSERVATION_FIELDS = ['elementId', 'value', 'unit', 'timeOffset', 'timeResolution', 'qualityCode']
+OBSERVATION_COLUMNS = ['sourceId', 'referenceTime'] + OBSERVATION_FIELDS
+
+
+def flatten_observations(items: List[dict]) -> pd.DataFrame:
+    """Flatten Frost observation items to one row per observation in a single Arrow pass.
+
+    referenceTime is parsed in one batch and returned as naive UTC.
+    """
+    if not items:
+        # Typed like a parsed response, so .dt and value arithmetic work on empty results (e.g. a 404)
+        empty = pd.DataFrame({column: pd.Series(dtype=object) for column in OBSERVATION_COLUMNS})
+        empty['referenceTime'] = pd.Series(dtype='datetime64[ns]')
+        empty['value'] = pd.Series(dtype=float)
+        return empty
+    array = pa.array(items)
+    observations = array.field('observations')
+    parent = pc.list_parent_indices(observations)
+    flat = pc.list_flatten(observations)
+    flat_fields = {field.name for field in flat.type}
+    columns = {
+        'sourceId': pc.take(array.field('sourceId'), parent),
+        'referenceTime': pc.take(array.field('referenceTime'), parent),
+    }
+    for name in OBSERVATION_FIELDS:
+        if name in flat_fields:
+            columns[name] = flat.field(name)
+    df = pa.table(columns).to_pandas()
+    df['referenceTime'] = pd.to_datetime(df['referenceTime'], utc=True).dt.tz_localize(None)
+    return df
+
+
+def pivot_observations(
+    observations: pd.DataFrame,
+    elements: Optional[List[str]] = None,
+    time_offsets: Optional[Dict[str, str]] = None,
+    column_names: Optional[Dict[str, str]] = None,
+) -> pd.DataFrame:
+    """One row per (sourceId, referenceTime) with one column per elementId.
+
+    time_offsets picks a timeOffset for elements reported with several (e.g.
+    {'mean(air_temperature P1M)': 'PT6H'}); otherwise the first observation is used.
+    column_names renames the element columns.
+    """
+    if elements is not None:
+        observations = observations[observations['elementId'].isin(elements)]
+    if time_offsets:
+        preferred = observations['elementId'].map(time_offsets)
+        observations = observations[preferred.isna() | (observations['timeOffset'] == preferred)]
+    observations = observations.drop_duplicates(['sourceId', 'referenceTime', 'elementId'])
+    wide = observations.pivot(index=['sourceId', 'referenceTime'], columns='elementId', values='value')
+    wide.columns.name = None
+    if elements is not None:
+        wide = wide.reindex(columns=elements)
+    if column_names:
+        wide = wide.rename(columns=column_names)
+    return wide.reset_index()
+
+
+class _NeedMoreData(Exception):
+    pass
+
+
+class _JSONStreamReader:
+    """Pull-style reader over a stream of UTF-8 byte chunks, decoding one JSON value at a time."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self.chunks = iter(chunks)
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.exhausted = False
+
+    def _fill(self) -> None:
+        if self.exhausted:
+            raise ValueError("Unexpected end of JSON stream")
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
+        try:
+            self.buffer += self.text_decoder.decode(next(self.chunks))
+        except StopIteration:
+            self.buffer += self.text_decoder.decode(b'', final=True)
+            self.exhausted = True
+
+    def peek(self) -> str:
+        """Next non-whitespace character, without consuming it."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\n\r':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            self._fill()
+
+    def expect(self, characters: str) -> str:
+        character = self.peek()
+        if character not in characters:
+            raise ValueError(f"Expected one of {characters!r} at position {self.pos}, got {character!r}")
+        self.pos += 1
+        return character
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A value ending exactly at the buffer end may be cut short (e.g. a number)
+                if end == len(self.buffer) and not self.exhausted:
+                    raise _NeedMoreData
+                self.pos = end
+                return value
+            except (json.JSONDecodeError, _NeedMoreData):
+                if self.exhausted:
+                    raise
+                self._fill()
+
+
+def iter_json_array_items(chunks: Iterable[bytes], key: str = 'data', other_values: Optional[dict] = None) -> Iterator:
+    """Yield the items of the top-level array under key as they are parsed from a byte stream.
+
+    Only one item (plus the current chunk) is held in memory at a time, unlike
+    response.json(), which materializes the whole document. The other top-level
+    values (e.g. nextLink) are put in other_values when given.
+    """
+    reader = _JSONStreamReader(chunks)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        name = reader.value()
+        reader.expect(':')
+        if name == key:
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.value()
+                    if reader.expect(',]') == ']':
+                        break
+        else:
+            value = reader.value()
+            if other_values is not None:
+                other_values[name] = value
+        if reader.expect(',}') == '}':
+            return
@@ -0,0 +1,150 @@
+import json
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Tuple
+import pandas as pd
+
+Interval = Tuple[pd.Timestamp, pd.Timestamp]
+
+
+def normalize_time(value) -> pd.Timestamp:
+    """Timestamp as naive UTC, so Frost times and user-given dates compare consistently."""
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp
+
+
+def subtract_intervals(start: pd.Timestamp, end: pd.Timestamp, covered: List[Interval]) -> List[Interval]:
+    """Parts of [start, end) not covered by any of the covered intervals."""
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in sorted(covered):
+        if covered_end <= cursor or covered_start >= end:
+            continue
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start))
+        cursor = max(cursor, covered_end)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+class ObservationCache:
+    """Persistent SQLite store of Frost observations plus the time ranges already fetched.
+
+    Observations are keyed by (source, elementId, timeOffset, referenceTime). Fetched
+    ranges are tracked per (source, elementId), so ranges without any observations
+    are not requested again either. Ranges that reach into the last recent_months are
+    only trusted for ttl, since Frost may still add or correct recent observations.
+    """
+
+    def __init__(self, path: Path, ttl: timedelta = timedelta(days=1), recent_months: int = 3):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.recent_months = recent_months
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS observations (
+                source TEXT NOT NULL,
+                element_id TEXT NOT NULL,
+                time_offset TEXT NOT NULL,
+                reference_time TEXT NOT NULL,
+                source_id TEXT NOT NULL,
+                observation TEXT NOT NULL,
+                PRIMARY KEY (source, element_id, time_offset, reference_time)
+            );
+            CREATE TABLE IF NOT EXISTS coverage (
+                source TEXT NOT NULL,
+                element_id TEXT NOT NULL,
+                start_time TEXT NOT NULL,
+                end_time TEXT NOT NULL,
+                fetched_at TEXT NOT NULL
+            );
+            """
+        )
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "ObservationCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _recent_cutoff(self, now: pd.Timestamp) -> pd.Timestamp:
+        return now - pd.DateOffset(months=self.recent_months)
+
+    def covered_intervals(self, source: str, element_id: str) -> List[Interval]:
+        """Fetched ranges that are still valid; expired recent parts are cut off."""
+        now = normalize_time(datetime.now(timezone.utc))
+        recent_cutoff = self._recent_cutoff(now)
+        intervals = []
+        rows = self.connection.execute(
+            "SELECT start_time, end_time, fetched_at FROM coverage WHERE source = ? AND element_id = ?",
+            (source, element_id),
+        )
+        for start_time, end_time, fetched_at in rows:
+            start, end = pd.Timestamp(start_time), pd.Timestamp(end_time)
+            if end > recent_cutoff and now - pd.Timestamp(fetched_at) > self.ttl:
+                end = min(end, recent_cutoff)
+            if start < end:
+                intervals.append((start, end))
+        return intervals
+
+    def missing_intervals(self, source: str, element_id: str, start_time: str, end_time: str) -> List[Interval]:
+        return subtract_intervals(
+            normalize_time(start_time), normalize_time(end_time), self.covered_intervals(source, element_id)
+        )
+
+    def store(self, response: dict, sources: List[str], elements: List[str], start_time: str, end_time: str) -> None:
+        """Store a Frost observations response and mark the range as fetched for every source x element."""
+        rows = []
+        for item in response.get('data', []):
+            source = item['sourceId'].split(':')[0]
+            reference_time = normalize_time(item['referenceTime']).isoformat()
+            for observation in item.get('observations', []):
+                rows.append((
+                    source,
+                    observation['elementId'],
+                    observation.get('timeOffset', ''),
+                    reference_time,
+                    item['sourceId'],
+                    json.dumps(observation),
+                ))
+        fetched_at = normalize_time(datetime.now(timezone.utc)).isoformat()
+        start, end = normalize_time(start_time).isoformat(), normalize_time(end_time).isoformat()
+        self.connection.executemany("INSERT OR REPLACE INTO observations VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.connection.executemany(
+            "INSERT INTO coverage VALUES (?, ?, ?, ?, ?)",
+            [(source, element, start, end, fetched_at) for source in sources for element in elements],
+        )
+        self.connection.commit()
+
+    def load(self, sources: List[str], elements: List[str], start_time: str, end_time: str) -> dict:
+        """Cached observations in the shape of a Frost observations response."""
+        start, end = normalize_time(start_time).isoformat(), normalize_time(end_time).isoformat()
+        items: Dict[Tuple[str, str], dict] = {}
+        for source in sources:
+            for element in elements:
+                rows = self.connection.execute(
+                    """
+                    SELECT source_id, reference_time, observation FROM observations
+                    WHERE source = ? AND element_id = ? AND reference_time >= ? AND reference_time < ?
+                    """,
+                    (source, element, start, end),
+                )
+                for source_id, reference_time, observation in rows:
+                    item = items.setdefault((source_id, reference_time), {
+                        'sourceId': source_id,
+                        'referenceTime': reference_time,
+                        'observations': [],
+                    })
+                    item['observations'].append(json.loads(observation))
+        data = [items[key] for key in sorted(items)]
+        return {'data': data, 'totalItemCount': len(data), 'currentItemCount': len(data)}
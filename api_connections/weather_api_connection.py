@@ -1,40 +1,256 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
 import requests
 import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from api_connections.frost_parsing import flatten_observations, iter_json_array_items
+from api_connections.observation_cache import ObservationCache
+
+STREAM_CHUNK_BYTES = 1 << 16
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def split_time_range(start_time: str, end_time: str, window: pd.DateOffset) -> List[Tuple[str, str]]:
+    """Split start/end into consecutive windows of at most one window each."""
+    start, end = pd.Timestamp(start_time), pd.Timestamp(end_time)
+    windows = []
+    while start < end:
+        window_end = min(start + window, end)
+        windows.append((start.isoformat(), window_end.isoformat()))
+        start = window_end
+    return windows
+
+
+def chunk_list(items: List[str], size: int) -> List[List[str]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def observation_params(
+    sources: List[str],
+    elements: List[str],
+    start_time: str,
+    end_time: str,
+    window: pd.DateOffset,
+    sources_per_request: int,
+) -> List[dict]:
+    """Query parameters for one request per source group x time window, source group first."""
+    return [
+        {
+            'sources': ','.join(source_group),
+            'elements': ','.join(elements),
+            'referencetime': f"{window_start}/{window_end}",
+        }
+        for source_group in chunk_list(list(sources), sources_per_request)
+        for window_start, window_end in split_time_range(start_time, end_time, window)
+    ]
 
 
 class WeatherAPIConnection:
-    def __init__(self, client_id: str, client_secret: str):
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        timeout: float = 60,
+        max_retries: int = 5,
+        backoff_factor: float = 1.0,
+        max_workers: int = 4,
+        base_url: str = "https://frost.met.no",
+        cache: Optional[ObservationCache] = None,
+    ):
         self.client_id =  client_id 
         self.client_secret = client_secret
-        self.base_url = "https://frost.met.no"
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.cache = cache
+
+        # One pooled session shared by all requests (and worker threads)
+        self.session = requests.Session()
+        self.session.auth = (self.client_id, self.client_secret)
+        self.session.headers.update({'Accept': 'application/json'})
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=['GET'],
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "WeatherAPIConnection":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _get(self, endpoint: str, params: Optional[dict] = None) -> dict:
+        """GET a Frost endpoint, following nextLink pages and merging their data lists.
+
+        Frost answers 404 when a query matches no data; that is returned as empty data.
+        """
+        response = self.session.get(endpoint, params=params, timeout=self.timeout)
+        if response.status_code == 404:
+            return {'data': []}
+        response.raise_for_status()
+        result = response.json()
+        next_link = result.get('nextLink')
+        while next_link:
+            page = self.session.get(next_link, timeout=self.timeout)
+            page.raise_for_status()
+            page_result = page.json()
+            result['data'].extend(page_result.get('data', []))
+            next_link = page_result.get('nextLink')
+        result.pop('nextLink', None)
+        return result
 
     def get_sources(self, kwargs) -> dict:
         endpoint = f"{self.base_url}/sources/v0.jsonld"
-        headers = {
-            'Accept': 'application/json',
-        }
-        params = kwargs
-        response = requests.get(endpoint, headers=headers, params=params, auth=(self.client_id, self.client_secret))
-        if response.status_code == 200:
-            return response.json()
-        else:
-            response.raise_for_status()
+        return self._get(endpoint, params=kwargs)
 
-    def get_weather_data(self, sources: List[str], elements: List[str], start_time: str, end_time: str) -> dict:
+    def iter_weather_data(
+        self,
+        sources: List[str],
+        elements: List[str],
+        start_time: str,
+        end_time: str,
+        window: pd.DateOffset = pd.DateOffset(years=1),
+        sources_per_request: int = 20,
+    ) -> Iterator[dict]:
+        """Fetch observations in chunks of one source group x one time window.
+
+        Chunks are requested concurrently by up to max_workers threads and yielded in
+        order (source group first, then time), so callers can merge them as they arrive.
+        """
         endpoint = f"{self.base_url}/observations/v0.jsonld"
-        headers = {
-            'Accept': 'application/json',
-        }
-        parameters = {
-            'sources': ','.join(sources),      
-            'elements': ','.join(elements),
-            'referencetime': f"{start_time}/{end_time}",
-        }
-        response = requests.get(endpoint, headers=headers, params=parameters, auth=(self.client_id, self.client_secret))
-        
-        if response.status_code == 200:
-            data = response.json()
-            return data
+        requests_params = observation_params(sources, elements, start_time, end_time, window, sources_per_request)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            yield from executor.map(lambda params: self._get(endpoint, params), requests_params)
+
+    def _stream_items(self, endpoint: str, params: dict) -> Iterator[dict]:
+        """Observation items of one query, parsed from the socket page by page along nextLink."""
+        url: Optional[str] = endpoint
+        while url:
+            other_values: dict = {}
+            with self.session.get(url, params=params, timeout=self.timeout, stream=True) as response:
+                if response.status_code == 404:
+                    return
+                response.raise_for_status()
+                yield from iter_json_array_items(
+                    response.iter_content(chunk_size=STREAM_CHUNK_BYTES), other_values=other_values
+                )
+            url, params = other_values.get('nextLink'), None
+
+    def iter_observations(
+        self,
+        sources: List[str],
+        elements: List[str],
+        start_time: str,
+        end_time: str,
+        batch_size: int = 10_000,
+        window: pd.DateOffset = pd.DateOffset(years=1),
+        sources_per_request: int = 20,
+    ) -> Iterator[pd.DataFrame]:
+        """Stream observations as flattened DataFrames of at most batch_size items each.
+
+        Each response body is parsed incrementally from the socket, so peak memory
+        is bounded by the batch size rather than by the response size. With a cache,
+        the missing intervals are streamed into it first, and the observations are
+        then read back one source group x time window at a time.
+        """
+        if self.cache is None:
+            items = (
+                item
+                for params in observation_params(sources, elements, start_time, end_time, window, sources_per_request)
+                for item in self._stream_items(f"{self.base_url}/observations/v0.jsonld", params)
+            )
         else:
-            response.raise_for_status()
\ No newline at end of file
+            self._stream_into_cache(sources, elements, start_time, end_time, batch_size, window, sources_per_request)
+            items = (
+                item
+                for source_group in chunk_list(list(sources), sources_per_request)
+                for window_start, window_end in split_time_range(start_time, end_time, window)
+                for item in self.cache.load(source_group, elements, window_start, window_end)['data']
+            )
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) == batch_size:
+                yield flatten_observations(batch)
+                batch = []
+        if batch:
+            yield flatten_observations(batch)
+
+    def _stream_into_cache(
+        self,
+        sources: List[str],
+        elements: List[str],
+        start_time: str,
+        end_time: str,
+        batch_size: int,
+        window: pd.DateOffset,
+        sources_per_request: int,
+    ) -> None:
+        endpoint = f"{self.base_url}/observations/v0.jsonld"
+        for (gap_start, gap_end), (gap_sources, gap_elements) in self._cache_gaps(sources, elements, start_time, end_time).items():
+            for params in observation_params(
+                gap_sources, gap_elements, gap_start.isoformat(), gap_end.isoformat(), window, sources_per_request
+            ):
+                batch = []
+                for item in self._stream_items(endpoint, params):
+                    batch.append(item)
+                    if len(batch) == batch_size:
+                        # Observations only; the range is marked as fetched once all of it is stored
+                        self.cache.store({'data': batch}, [], [], gap_start, gap_end)
+                        batch = []
+                self.cache.store({'data': batch}, [], [], gap_start, gap_end)
+            self.cache.store({'data': []}, gap_sources, gap_elements, gap_start, gap_end)
+
+    def _cache_gaps(
+        self, sources: List[str], elements: List[str], start_time: str, end_time: str
+    ) -> Dict[Tuple[pd.Timestamp, pd.Timestamp], Tuple[List[str], List[str]]]:
+        """Intervals missing from the cache, each with the sources and elements missing it."""
+        gaps: Dict[Tuple[pd.Timestamp, pd.Timestamp], Tuple[set, set]] = {}
+        for source in sources:
+            for element in elements:
+                for gap in self.cache.missing_intervals(source, element, start_time, end_time):
+                    gap_sources, gap_elements = gaps.setdefault(gap, (set(), set()))
+                    gap_sources.add(source)
+                    gap_elements.add(element)
+        return {gap: (sorted(gap_sources), sorted(gap_elements)) for gap, (gap_sources, gap_elements) in gaps.items()}
+
+    def get_weather_data(self, sources: List[str], elements: List[str], start_time: str, end_time: str, **chunking) -> dict:
+        """Observations for sources x elements in [start_time, end_time).
+
+        With a cache, only the intervals not cached yet (or expired) are fetched and
+        the answer is served from the cache.
+        """
+        if self.cache is None:
+            return self._fetch_weather_data(sources, elements, start_time, end_time, **chunking)
+
+        for (gap_start, gap_end), (gap_sources, gap_elements) in self._cache_gaps(sources, elements, start_time, end_time).items():
+            response = self._fetch_weather_data(
+                gap_sources, gap_elements, gap_start.isoformat(), gap_end.isoformat(), **chunking
+            )
+            self.cache.store(response, gap_sources, gap_elements, gap_start, gap_end)
+        return self.cache.load(sources, elements, start_time, end_time)
+
+    def _fetch_weather_data(self, sources: List[str], elements: List[str], start_time: str, end_time: str, **chunking) -> dict:
+        merged = None
+        for chunk in self.iter_weather_data(sources, elements, start_time, end_time, **chunking):
+            if merged is None:
+                merged = chunk
+            else:
+                merged['data'].extend(chunk.get('data', []))
+        merged = merged or {'data': []}
+        merged['totalItemCount'] = len(merged['data'])
+        merged['currentItemCount'] = len(merged['data'])
+        return merged
@@ -0,0 +1,32 @@
+import sys
+import time
+from pathlib import Path
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+from allocate_bydel_to_data import allocate_bydel_to_data, allocate_bydel_to_data_vectorized
+from benchmarks.synthetic import make_synthetic_bydeler, make_synthetic_readings
+
+def main(n_rows: int = 2_000_000, n_addresses: int = 20_000, legacy_sample: int = 5_000):
+    gdf = make_synthetic_bydeler()
+    df = make_synthetic_readings(n_rows, n_addresses, missing_coordinates=0.02)
+    df = df[['addresse', 'forbruk_kwh', 'latitude', 'longitude']].astype({'addresse': str})
+
+    start = time.perf_counter()
+    vectorized = allocate_bydel_to_data_vectorized(df, gdf)
+    vectorized_time = time.perf_counter() - start
+
+    sample = df.head(legacy_sample)
+    start = time.perf_counter()
+    legacy = allocate_bydel_to_data(sample, gdf)
+    legacy_time = (time.perf_counter() - start) * n_rows / legacy_sample
+
+    pd.testing.assert_frame_equal(legacy, vectorized.head(legacy_sample))
+    print(f"Rows: {n_rows}, unique addresses: {n_addresses}")
+    print(f"Vectorized: {vectorized_time:.2f} s")
+    print(f"Row-by-row (extrapolated from {legacy_sample} rows): {legacy_time:.2f} s")
+    print(f"Speedup: {legacy_time / vectorized_time:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
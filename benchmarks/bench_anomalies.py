@@ -0,0 +1,72 @@
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+from utils.anomalies import WINDOW_MONTHS, cube_for_detection, detect_anomalies, meter_month_matrix
+
+
+def make_monthly_cube(n_meters: int, n_months: int, seed: int = 0) -> pd.DataFrame:
+    """One cube cell per meter-month with seasonal consumption, ~5 % of the months missing."""
+    rng = np.random.default_rng(seed)
+    meter = np.repeat(np.arange(n_meters), n_months)
+    month_index = np.tile(np.arange(n_months), n_meters)
+    level = rng.gamma(2.0, 50.0, n_meters)[meter]
+    season = 1.0 + 0.5 * np.cos(2 * np.pi * (month_index % 12) / 12)
+    mean = level * season * rng.normal(1.0, 0.1, len(meter))
+    keep = rng.random(len(meter)) > 0.05
+    return pd.DataFrame({
+        'kategori': pd.Categorical(np.where(meter % 4 == 0, 'Trafikkstyring', 'Belysning')),
+        'BYDELSNAVN': pd.Categorical(np.array([f'Bydel {b}' for b in range(15)])[meter % 15]),
+        'year': (2014 + month_index // 12).astype('int16'),
+        'month': (month_index % 12 + 1).astype('int8'),
+        'addresse': pd.Categorical(np.array([f'Adresse {i}' for i in range(n_meters)])[meter]),
+        'sum': mean * 30,
+        'count': 30,
+        'min': mean,
+        'max': mean,
+        'mean': mean,
+    })[keep].reset_index(drop=True)
+
+
+def per_meter_loop(cube: pd.DataFrame) -> int:
+    """Rolling median/MAD with a Python loop over meters, as a per-meter script would do it."""
+    flagged = 0
+    monthly = cube.groupby(['addresse', 'kategori', 'year', 'month'], observed=True)['mean'].mean()
+    for _, series in monthly.groupby(level=['addresse', 'kategori'], observed=True):
+        history = series.shift(1).rolling(WINDOW_MONTHS, min_periods=6)
+        median = history.median()
+        mad = (series.shift(1) - median).abs().rolling(WINDOW_MONTHS, min_periods=6).median()
+        flagged += int(((series - median).abs() > 5 * 1.4826 * mad).sum())
+    return flagged
+
+
+def main(n_meters: int = 20_000, n_months: int = 108, loop_meters: int = 2_000):
+    cube = make_monthly_cube(n_meters, n_months)
+    print(f"Meters: {n_meters}, months: {n_months}, cube cells: {len(cube)}")
+
+    start = time.perf_counter()
+    anomalies = detect_anomalies(cube)
+    full_time = time.perf_counter() - start
+
+    _, periods, _ = meter_month_matrix(cube)
+    since = periods[-1]
+    start = time.perf_counter()
+    detect_anomalies(cube_for_detection(cube, since), since=since)
+    incremental_time = time.perf_counter() - start
+
+    sample = cube[cube['addresse'].cat.codes < loop_meters].copy()
+    sample['addresse'] = sample['addresse'].cat.remove_unused_categories()
+    start = time.perf_counter()
+    per_meter_loop(sample)
+    loop_time = time.perf_counter() - start
+
+    print(f"Full history: {full_time:.2f} s ({len(anomalies)} flagged meter-months)")
+    print(f"Incremental, newest month only: {incremental_time:.2f} s")
+    print(f"Per-meter loop: {loop_time:.2f} s for {loop_meters} meters, ~{loop_time * n_meters / loop_meters:.0f} s for all")
+
+
+if __name__ == "__main__":
+    main()
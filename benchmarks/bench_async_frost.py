@@ -0,0 +1,83 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import Tuple
+import pandas as pd
+from aiohttp import web
+
+sys.path.append(str(Path(__file__).parent.parent))
+from api_connections.async_weather_api_connection import AsyncWeatherAPIConnection
+from api_connections.weather_api_connection import split_time_range
+
+LATENCY_SECONDS = 0.05
+server_requests = 0
+
+
+async def mock_observations(request: web.Request) -> web.Response:
+    """Frost-like observations endpoint answering after a fixed latency."""
+    global server_requests
+    server_requests += 1
+    await asyncio.sleep(LATENCY_SECONDS)
+    reference_time = request.query['referencetime'].split('/')[0]
+    return web.json_response({'data': [{
+        'sourceId': f"{request.query['sources']}:0",
+        'referenceTime': reference_time,
+        'observations': [
+            {'elementId': element, 'value': 1.0, 'timeOffset': 'PT0H'}
+            for element in request.query['elements'].split(',')
+        ],
+    }]})
+
+
+async def run(base_url: str, sources, max_concurrency: int) -> float:
+    start = time.perf_counter()
+    async with AsyncWeatherAPIConnection('id', 'secret', max_concurrency=max_concurrency, base_url=base_url) as connection:
+        await connection.get_weather_data(
+            sources, ['mean(air_temperature P1M)', 'mean(cloud_area_fraction P1M)'], '2014-01-01', '2023-01-01'
+        )
+    return time.perf_counter() - start
+
+
+async def run_duplicates(base_url: str, sources, copies: int) -> Tuple[float, int]:
+    """Issue every (source, window) request copies times concurrently; return time and server hits."""
+    hits_before = server_requests
+    elements = ['mean(air_temperature P1M)', 'mean(cloud_area_fraction P1M)']
+    windows = split_time_range('2014-01-01', '2023-01-01', pd.DateOffset(years=1))
+    start = time.perf_counter()
+    async with AsyncWeatherAPIConnection('id', 'secret', max_concurrency=20, base_url=base_url) as connection:
+        await asyncio.gather(*[
+            connection.fetch(source, elements, window_start, window_end)
+            for _ in range(copies)
+            for source in sources
+            for window_start, window_end in windows
+        ])
+    return time.perf_counter() - start, server_requests - hits_before
+
+
+async def main(n_sources: int = 40):
+    app = web.Application()
+    app.router.add_get('/observations/v0.jsonld', mock_observations)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    base_url = f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+    sources = [f'SN{i}' for i in range(n_sources)]
+    n_requests = n_sources * 9
+    print(f"{n_requests} unique requests, {LATENCY_SECONDS * 1000:.0f} ms latency each")
+    for max_concurrency in (1, 5, 10, 20, 50):
+        elapsed = await run(base_url, sources, max_concurrency)
+        expected = n_requests * LATENCY_SECONDS / max_concurrency
+        print(f"max_concurrency={max_concurrency:>3}: {elapsed:.2f} s (lower bound {expected:.2f} s)")
+
+    # Identical requests issued concurrently should share one server round trip
+    copies = 3
+    elapsed, hits = await run_duplicates(base_url, sources, copies)
+    print(f"{copies * n_requests} fetches of {n_requests} distinct requests: {hits} server requests, {elapsed:.2f} s")
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
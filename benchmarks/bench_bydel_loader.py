@@ -0,0 +1,50 @@
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import shapely
+import topojson as tp
+
+sys.path.append(str(Path(__file__).parent.parent))
+from benchmarks.synthetic import make_synthetic_bydeler
+from utils.loading_funcs import load_bydeler_geodata
+
+
+def write_synthetic_topojson(path: Path, max_segment_length: float = 0.0002) -> None:
+    """Synthetic bydeler densified to real-boundary vertex counts, written as TopoJSON."""
+    gdf = make_synthetic_bydeler()
+    # Wiggle the densified edges as a function of position, so shared borders stay shared
+    gdf['geometry'] = shapely.transform(
+        gdf.geometry.segmentize(max_segment_length).values,
+        lambda xy: xy + 0.0001 * np.sin(xy[:, ::-1] * 5000),
+    )
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(tp.Topology(gdf, object_name='Bydeler').to_dict(), f)
+
+
+def main(repeats: int = 5):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'Bydeler.json'
+        write_synthetic_topojson(path)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            uncached = load_bydeler_geodata(path, use_cache=False)
+        uncached_time = (time.perf_counter() - start) / repeats
+
+        load_bydeler_geodata(path)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            cached = load_bydeler_geodata(path)
+        cached_time = (time.perf_counter() - start) / repeats
+
+    assert cached.geom_equals(uncached).all()
+    print(f"TopoJSON conversion: {uncached_time * 1000:.0f} ms")
+    print(f"GeoParquet cache: {cached_time * 1000:.0f} ms")
+    print(f"Speedup: {uncached_time / cached_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
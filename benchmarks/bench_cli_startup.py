@@ -0,0 +1,38 @@
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from cli import COMMANDS
+
+# Subcommands that neither plot nor map must be ready to run within this budget
+STARTUP_BUDGET_S = 1.0
+PLOTTING_COMMANDS = {'analyse', 'analyse-weather', 'map'}
+
+
+def time_startup(command: str, repeats: int) -> float:
+    """Best-of wall time for a fresh interpreter to import a subcommand's module."""
+    code = f"import cli; cli.load_command({command!r})"
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=Path(__file__).parent.parent, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(repeats: int = 3):
+    over_budget = []
+    for command in COMMANDS:
+        startup = time_startup(command, repeats)
+        budget = '' if command in PLOTTING_COMMANDS else f" (budget {STARTUP_BUDGET_S:.1f} s)"
+        print(f"{command:16s} {startup:.2f} s{budget}")
+        if command not in PLOTTING_COMMANDS and startup > STARTUP_BUDGET_S:
+            over_budget.append(command)
+    if over_budget:
+        raise SystemExit(f"Over startup budget: {', '.join(over_budget)}")
+
+
+if __name__ == "__main__":
+    main()
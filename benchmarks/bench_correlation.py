@@ -0,0 +1,57 @@
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from scipy.stats import pearsonr, spearmanr
+
+sys.path.append(str(Path(__file__).parent.parent))
+from utils.correlation import correlation_table
+
+
+def make_monthly_matrices(n_kategori: int = 12, n_bydel: int = 17, n_elements: int = 6, seed: int = 0):
+    """Monthly consumption per kategori x bydel, partly driven by the first weather element."""
+    rng = np.random.default_rng(seed)
+    index = pd.period_range('2014-01', '2022-12', freq='M')
+    weather = pd.DataFrame(
+        rng.normal(size=(len(index), n_elements)), index=index, columns=[f'element_{i}' for i in range(n_elements)]
+    )
+    columns = pd.MultiIndex.from_product(
+        [[f'kategori_{k}' for k in range(n_kategori)], [f'bydel_{b}' for b in range(n_bydel)]],
+        names=['kategori', 'BYDELSNAVN'],
+    )
+    signal = 0.5 * weather['element_0'].to_numpy()[:, None]
+    consumption = pd.DataFrame(rng.normal(size=(len(index), len(columns))) + signal, index=index, columns=columns)
+    return consumption, weather
+
+
+def main(lags=(0, 1, 2, 3), n_bootstrap: int = 1000):
+    consumption, weather = make_monthly_matrices()
+    n_pairs = consumption.shape[1] * weather.shape[1] * len(lags)
+    print(f"Series: {consumption.shape[1]}, elements: {weather.shape[1]}, lags: {len(lags)}, pairs: {n_pairs}")
+
+    start = time.perf_counter()
+    table = correlation_table(consumption, weather, lags=lags)
+    vectorized_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for column in consumption.columns:
+        for element in weather.columns:
+            for lag in lags:
+                shifted = weather[element].shift(lag)
+                observed = shifted.notna()
+                pearsonr(consumption[column][observed], shifted[observed])
+                spearmanr(consumption[column][observed], shifted[observed])
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    correlation_table(consumption, weather, lags=(0,), n_bootstrap=n_bootstrap)
+    bootstrap_time = time.perf_counter() - start
+
+    print(f"Vectorized table: {vectorized_time:.3f} s ({len(table)} rows)")
+    print(f"Loop of pearsonr/spearmanr: {loop_time:.2f} s")
+    print(f"Lag 0 with {n_bootstrap} bootstrap resamples: {bootstrap_time:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
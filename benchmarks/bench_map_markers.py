@@ -0,0 +1,43 @@
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+from map_measurments import CATEGORY_COLORS, add_location_markers, add_location_markers_fast, create_base_map
+
+
+def make_synthetic_locations(n_locations: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "addresse": [f"Adresse {i}" for i in range(n_locations)],
+        "kategori": rng.choice(list(CATEGORY_COLORS), n_locations),
+        "latitude": rng.uniform(59.8, 60.0, n_locations),
+        "longitude": rng.uniform(10.6, 10.95, n_locations),
+        "forbruk_kwh": rng.gamma(2.0, 500.0, n_locations),
+    })
+
+
+def render(add_markers, df_locations: pd.DataFrame, output_path: Path) -> float:
+    start = time.perf_counter()
+    m = create_base_map()
+    add_markers(m, df_locations, CATEGORY_COLORS)
+    m.save(output_path)
+    return time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_locations in (1_000, 5_000, 20_000):
+            df_locations = make_synthetic_locations(n_locations)
+            for name, add_markers in (("CircleMarker", add_location_markers), ("FastMarkerCluster", add_location_markers_fast)):
+                output_path = Path(tmp) / f"{name}_{n_locations}.html"
+                elapsed = render(add_markers, df_locations, output_path)
+                size_mb = output_path.stat().st_size / 1024 ** 2
+                print(f"{n_locations:>6} locations, {name:<17}: {elapsed:6.2f} s, {size_mb:6.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
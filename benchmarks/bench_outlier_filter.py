@@ -0,0 +1,41 @@
+import sys
+import time
+from pathlib import Path
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+from benchmarks.synthetic import make_synthetic_readings
+from utils.transformations import clean_data_from_outliers, remove_outliers_iqr
+
+KATEGORIER = ['Belysning', 'Trafikkstyring', 'P-automater', 'Ladestasjoner'] + [f'Kategori {i}' for i in range(16)]
+
+
+def clean_data_from_outliers_concat(dataframe: pd.DataFrame) -> pd.DataFrame:
+    """The previous implementation: one mask and one concat per kategori."""
+    cleaned_df = pd.DataFrame()
+    for category in dataframe['kategori'].unique():
+        category_df = dataframe[dataframe['kategori'] == category]
+        cleaned_df = pd.concat([cleaned_df, remove_outliers_iqr(category_df, 'forbruk_kwh')])
+    return cleaned_df
+
+
+def main(n_rows: int = 10_000_000):
+    df = make_synthetic_readings(n_rows, kategorier=KATEGORIER, missing_forbruk=0.01)
+
+    start = time.perf_counter()
+    legacy = clean_data_from_outliers_concat(df)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = clean_data_from_outliers(df)
+    vectorized_time = time.perf_counter() - start
+
+    assert legacy.index.sort_values().equals(vectorized.index)
+    print(f"Rows: {n_rows}")
+    print(f"Concat loop: {legacy_time:.2f} s")
+    print(f"Single mask: {vectorized_time:.2f} s")
+    print(f"Speedup: {legacy_time / vectorized_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
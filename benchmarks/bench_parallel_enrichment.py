@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+from pathlib import Path
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+from allocate_bydel_to_data import allocate_bydel_to_data_vectorized
+from allocate_location_to_el_data import allocate_location_to_el_data, geo_lookup_table
+from benchmarks.synthetic import make_synthetic_bydeler, make_synthetic_readings
+from utils.parallel import map_partitions
+
+
+def legacy_allocate_location(df: pd.DataFrame, geo_locations: dict) -> pd.DataFrame:
+    """The per-row .apply lookup that allocate_location_to_el_data used to do."""
+    df['latitude'] = df['addresse'].apply(lambda addr: geo_locations.get(addr, {}).get('latitude'))
+    df['longitude'] = df['addresse'].apply(lambda addr: geo_locations.get(addr, {}).get('longitude'))
+    return df
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main(n_rows: int = 2_000_000, n_addresses: int = 20_000, worker_counts=(1, 2, 4, 8)):
+    gdf = make_synthetic_bydeler()
+    consumption = make_synthetic_readings(n_rows, n_addresses, missing_coordinates=0.02)
+    consumption = consumption[['addresse', 'forbruk_kwh', 'latitude', 'longitude']]
+    geo_locations = (
+        consumption.drop_duplicates('addresse').set_index('addresse')[['latitude', 'longitude']]
+        .to_dict(orient='index')
+    )
+    df = consumption[['addresse', 'forbruk_kwh']]
+    print(f"Rows: {n_rows}, unique addresses: {n_addresses}, CPU cores: {os.cpu_count()}")
+
+    legacy, legacy_time = timed(legacy_allocate_location, df.copy(), geo_locations)
+    vectorized, vectorized_time = timed(allocate_location_to_el_data, df.copy(), geo_locations)
+    # On a categorical addresse the legacy apply returned categorical coordinates
+    pd.testing.assert_frame_equal(legacy.astype({'latitude': float, 'longitude': float}), vectorized)
+    print(f"Geo lookup, row-wise apply: {legacy_time:.2f} s")
+    print(f"Geo lookup, category codes: {vectorized_time:.2f} s")
+
+    lookup = geo_lookup_table(geo_locations)
+    for workers in worker_counts:
+        _, seconds = timed(map_partitions, df.copy(), allocate_location_to_el_data, lookup, max_workers=workers)
+        print(f"Geo lookup, {workers} worker(s): {seconds:.2f} s")
+    for workers in worker_counts:
+        _, seconds = timed(map_partitions, consumption, allocate_bydel_to_data_vectorized, gdf, max_workers=workers)
+        print(f"Bydel join, {workers} worker(s): {seconds:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import sys
+import tempfile
+import time
+from pathlib import Path
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import pandas as pd
+import seaborn as sns
+
+sys.path.append(str(Path(__file__).parent.parent))
+from benchmarks.synthetic import make_synthetic_readings
+from utils.visualisation_funcs import BOXPLOT_PANELS, HISTOGRAM_PANELS, boxplot_per_kategori_per_month, histogram_per_kategori
+
+
+def legacy_plots(dataframe: pd.DataFrame, output_dir: Path) -> None:
+    """Raw-row histograms and seaborn boxplots, as the plots were drawn before."""
+    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
+    for ax, (kategori, _, color) in zip(axes.flat, HISTOGRAM_PANELS):
+        ax.hist(dataframe.loc[dataframe['kategori'] == kategori, 'forbruk_kwh'].dropna(), bins=100, color=color)
+    fig.savefig(output_dir / 'legacy_hist.png', dpi=300)
+    plt.close(fig)
+
+    month_name = pd.to_datetime(dataframe['dato']).dt.strftime('%b')
+    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+    for ax, (kategori, color) in zip(axes.flat, BOXPLOT_PANELS):
+        mask = dataframe['kategori'] == kategori
+        sns.boxplot(x=month_name[mask], y=dataframe.loc[mask, 'forbruk_kwh'], ax=ax, color=color)
+    fig.savefig(output_dir / 'legacy_box.png', dpi=300)
+    plt.close(fig)
+
+
+def main(row_counts=(100_000, 1_000_000, 5_000_000)):
+    with tempfile.TemporaryDirectory() as tmp:
+        output_dir = Path(tmp)
+        for n_rows in row_counts:
+            kategorier = [kategori for kategori, _ in BOXPLOT_PANELS] + ['Annet']
+            df = make_synthetic_readings(n_rows, kategorier=kategorier, daily=True, forbruk_scale=1500.0)
+            start = time.perf_counter()
+            legacy_plots(df, output_dir)
+            legacy_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            histogram_per_kategori(df, output_dir / 'hist.png')
+            boxplot_per_kategori_per_month(df, output_dir / 'box.png')
+            summary_time = time.perf_counter() - start
+            print(f"{n_rows:>9} rows: raw rows {legacy_time:.1f} s, summaries {summary_time:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
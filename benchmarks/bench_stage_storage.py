@@ -0,0 +1,49 @@
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+from benchmarks.synthetic import make_synthetic_readings
+from utils.storage import read_stage, stage_filters, write_stage
+
+def load(mode: str, path: str) -> None:
+    """Run one load in this process and print wall time and peak RSS."""
+    start = time.perf_counter()
+    if mode == 'csv':
+        df = pd.read_csv(path, engine='python')
+        df = df[(df['kategori'] == 'Belysning') & (pd.to_datetime(df['dato']).dt.year == 2020)]
+    else:
+        df = read_stage(Path(path), columns=['addresse', 'dato', 'forbruk_kwh'],
+                        filters=stage_filters(year=2020, kategori='Belysning'))
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode}: {elapsed:.2f} s, peak RSS {peak_mb:.0f} MB, {len(df)} rows")
+
+
+def write(tmp: str, n_rows: int) -> None:
+    # Plain strings, as the columns arrive from the stromforbruk CSV
+    df = make_synthetic_readings(n_rows).astype({'addresse': str, 'kategori': str, 'BYDELSNAVN': str})
+    df.to_csv(Path(tmp) / 'stage.csv', index=False)
+    write_stage(df, Path(tmp) / 'stage.parquet')
+
+
+def main(n_rows: int = 2_000_000):
+    # Every step runs in its own process: Linux keeps the peak RSS across exec,
+    # so the parent must stay small for the readers' numbers to mean anything
+    with tempfile.TemporaryDirectory() as tmp:
+        subprocess.run([sys.executable, __file__, 'write', tmp, str(n_rows)], check=True)
+        for mode, name in (('csv', 'stage.csv'), ('parquet', 'stage.parquet')):
+            subprocess.run([sys.executable, __file__, mode, str(Path(tmp) / name)], check=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == 'write':
+        write(sys.argv[2], int(sys.argv[3]))
+    elif len(sys.argv) == 3:
+        load(sys.argv[1], sys.argv[2])
+    else:
+        main()
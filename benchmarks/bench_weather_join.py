@@ -0,0 +1,60 @@
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+from benchmarks.synthetic import make_synthetic_readings
+from utils.weather_join import StationWeather, attach_nearest_station, attach_station_weather, station_key
+
+
+def make_hourly_weather(stations, start: str = '2014-01-01', end: str = '2022-12-31', seed: int = 0) -> pd.DataFrame:
+    """Hourly observations per station with ~5 % of the hours missing, in arbitrary order."""
+    rng = np.random.default_rng(seed)
+    hours = pd.date_range(start, end, freq='h')
+    frames = []
+    for station in stations:
+        kept = hours[rng.random(len(hours)) > 0.05]
+        frames.append(pd.DataFrame({
+            'sourceId': f'{station}:0',
+            'referenceTime': kept,
+            'air_temperature': rng.normal(5, 8, len(kept)),
+            'cloud_area_fraction': rng.uniform(0, 8, len(kept)),
+        }))
+    return pd.concat(frames, ignore_index=True).sample(frac=1, random_state=seed)
+
+
+def main(n_rows: int = 5_000_000, n_addresses: int = 20_000, n_stations: int = 12):
+    stations = [f'SN{18000 + 50 * i}' for i in range(n_stations)]
+    weather = make_hourly_weather(stations)
+    allocated = {f'Adresse {i}': {'station_id': stations[i % n_stations]} for i in range(n_addresses)}
+    consumption = attach_nearest_station(
+        make_synthetic_readings(n_rows, n_addresses, daily=True, forbruk_scale=50.0)[['addresse', 'dato', 'forbruk_kwh']],
+        allocated,
+    )
+    value_columns = ['air_temperature', 'cloud_area_fraction']
+    print(f"Rows: {n_rows}, stations: {n_stations}, hourly observations: {len(weather)}")
+
+    start = time.perf_counter()
+    station_weather = StationWeather(weather, value_columns)
+    joined = attach_station_weather(consumption, station_weather, 'dato', how='backward')
+    indexed_time = time.perf_counter() - start
+
+    # merge_asof needs both sides sorted on time and the original order restored afterwards
+    start = time.perf_counter()
+    right = weather.assign(station_id=station_key(weather['sourceId']).astype(str)).sort_values('referenceTime')
+    left = consumption.assign(station_id=consumption['station_id'].astype(str)).reset_index().sort_values('dato')
+    merged = pd.merge_asof(
+        left, right[['station_id', 'referenceTime'] + value_columns],
+        left_on='dato', right_on='referenceTime', by='station_id', direction='backward',
+    ).set_index('index').sort_index()
+    merge_asof_time = time.perf_counter() - start
+
+    np.testing.assert_allclose(joined[value_columns].to_numpy(), merged[value_columns].to_numpy())
+    print(f"StationWeather lookup: {indexed_time:.2f} s")
+    print(f"merge_asof: {merge_asof_time:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
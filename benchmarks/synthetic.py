@@ -0,0 +1,66 @@
+from typing import Sequence
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from shapely.geometry import box
+
+OSLO_BOUNDS = (10.60, 59.80, 10.95, 60.00)
+KATEGORIER = ['Belysning', 'Trafikkstyring', 'P-automater', 'Ladestasjoner', 'Annet']
+N_BYDELER = 17
+
+
+def make_synthetic_bydeler(n_cols: int = 6, n_rows: int = 3) -> gpd.GeoDataFrame:
+    """Grid of rectangular districts covering Oslo, standing in for the real bydel polygons."""
+    min_lon, min_lat, max_lon, max_lat = OSLO_BOUNDS
+    lons = np.linspace(min_lon, max_lon, n_cols + 1)
+    lats = np.linspace(min_lat, max_lat, n_rows + 1)
+    records = []
+    for i in range(n_cols):
+        for j in range(n_rows):
+            bydel = i * n_rows + j + 1
+            records.append({
+                'BYDELSNAVN': f'Bydel {bydel}',
+                'BYDEL': bydel,
+                'Kombinert': f'{bydel:02d} Bydel {bydel}',
+                'geometry': box(lons[i], lats[j], lons[i + 1], lats[j + 1]),
+            })
+    return gpd.GeoDataFrame(records, crs='EPSG:4326')
+
+
+def make_synthetic_readings(
+    n_rows: int,
+    n_addresses: int = 20_000,
+    seed: int = 0,
+    kategorier: Sequence[str] = KATEGORIER,
+    daily: bool = False,
+    forbruk_scale: float = 500.0,
+    missing_coordinates: float = 0.0,
+    missing_forbruk: float = 0.0,
+) -> pd.DataFrame:
+    """Readings 2014-2022 in the stromforbruk layout, each address keeping its coordinates and bydel.
+
+    dato is a month start, or any day with daily. A share missing_coordinates of the
+    addresses has no latitude, and some lie just outside the synthetic bydel grid.
+    """
+    rng = np.random.default_rng(seed)
+    min_lon, min_lat, max_lon, max_lat = OSLO_BOUNDS
+    lat = rng.uniform(min_lat - 0.02, max_lat, n_addresses)
+    lon = rng.uniform(min_lon, max_lon + 0.02, n_addresses)
+    lat[rng.random(n_addresses) < missing_coordinates] = np.nan
+    address_idx = rng.integers(0, n_addresses, n_rows)
+    if daily:
+        dato = pd.Timestamp('2014-01-01') + pd.to_timedelta(rng.integers(0, 3287, n_rows), 'D')
+    else:
+        months = pd.date_range('2014-01-01', '2022-12-01', freq='MS')
+        dato = months[rng.integers(0, len(months), n_rows)]
+    forbruk = rng.gamma(2.0, forbruk_scale, n_rows)
+    forbruk[rng.random(n_rows) < missing_forbruk] = np.nan
+    return pd.DataFrame({
+        'addresse': pd.Categorical.from_codes(address_idx, [f'Adresse {i}' for i in range(n_addresses)]),
+        'dato': dato,
+        'kategori': pd.Categorical(rng.choice(list(kategorier), n_rows)),
+        'forbruk_kwh': forbruk,
+        'latitude': lat[address_idx],
+        'longitude': lon[address_idx],
+        'BYDELSNAVN': pd.Categorical.from_codes(address_idx % N_BYDELER, [f'Bydel {i}' for i in range(N_BYDELER)]),
+    })
@@ -0,0 +1,16 @@
+from utils.consumption_cube import build_consumption_cube
+from utils.incremental import row_key_hashes, save_cube_with_keys
+from utils.storage import STAGE_PATHS, read_stage
+from utils.transformations import electricity_cleaning_pipeline
+
+
+def main():
+    electricity_df = read_stage(STAGE_PATHS['bydel'])
+    key_hashes = row_key_hashes(electricity_df)
+    electricity_df = electricity_cleaning_pipeline().run(electricity_df)
+    cube = build_consumption_cube(electricity_df)
+    save_cube_with_keys(cube, key_hashes)
+    print(f"Cube with {len(cube)} cells built from {len(electricity_df)} rows")
+
+if __name__ == "__main__":
+    main()
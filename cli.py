@@ -0,0 +1,55 @@
+import argparse
+import importlib
+from typing import Callable, List, Optional
+
+# subcommand -> (module with a main(), help). Modules are imported only when their
+# subcommand runs, so e.g. geocode never pays for geopandas, matplotlib or folium.
+COMMANDS = {
+    'geocode': ('allocate_location_to_el_data', 'Geocode addresses and write the geo stage'),
+    'allocate': ('allocate_bydel_to_data', 'Allocate bydel to the geo stage and write the bydel stage'),
+    'stations': ('allocate_clostest_weather_station', 'Allocate the closest weather station per address'),
+    'cube': ('build_consumption_cube', 'Build the consumption cube from the bydel stage'),
+    'anomalies': ('detect_consumption_anomalies', 'Flag per-meter consumption anomalies in the cube'),
+    'ingest': ('ingest_new_release', 'Incrementally ingest a new stromforbruk release'),
+    'analyse': ('analyse_electricity_city', 'Plot consumption per bydel and the average map'),
+    'analyse-weather': ('analyse_electricity_weather', 'Plot lighting consumption against weather'),
+    'map': ('map_measurments', 'Render the measurement location map'),
+}
+
+
+def load_command(name: str) -> Callable[[], None]:
+    """Import the module behind a subcommand and return its main."""
+    module_name, _ = COMMANDS[name]
+    return importlib.import_module(module_name).main
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='oslo-electricity', description='Oslo electricity consumption pipeline')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        subparsers.add_parser(name, help=help_text)
+    run_parser = subparsers.add_parser('run', help='Run the stale pipeline stages needed for the given targets')
+    run_parser.add_argument('targets', nargs='*', metavar='STAGE', help='Stages to bring up to date (default: all)')
+    run_parser.add_argument('--force', action='store_true', help='Re-run stages even if their inputs are unchanged')
+    run_parser.add_argument('--jobs', type=int, default=2, help='Maximum number of stages to run in parallel')
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        from utils.pipeline import run_pipeline
+        try:
+            report = run_pipeline(targets=args.targets, force=args.force, max_workers=args.jobs)
+        except ValueError as error:
+            parser.error(str(error))
+        print(report.to_string(index=False))
+        if report['status'].isin(['failed', 'blocked']).any():
+            raise SystemExit(1)
+        return
+    load_command(args.command)()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+from utils.anomalies import ANOMALY_PATH, detect_anomalies
+from utils.consumption_cube import CUBE_PATH, load_cube
+
+
+def main():
+    """Flag meter-months that break with the meter's own history and store them next to the cube."""
+    cube = load_cube(CUBE_PATH)
+    anomalies = detect_anomalies(cube)
+    anomalies.to_parquet(ANOMALY_PATH, index=False)
+    print(f"{len(anomalies)} anomalous meter-months in {cube['addresse'].nunique()} meters")
+    print(anomalies['reason'].value_counts().to_string())
+
+if __name__ == "__main__":
+    main()
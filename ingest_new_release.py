@@ -0,0 +1,91 @@
+import json
+from pathlib import Path
+from typing import Tuple
+import numpy as np
+import pandas as pd
+
+from allocate_bydel_to_data import allocate_bydel_to_data_vectorized
+from allocate_location_to_el_data import allocate_location_to_el_data, get_location_info_per_address, read_json
+from utils.anomalies import ANOMALY_PATH, update_anomalies
+from utils.consumption_cube import CUBE_PATH, load_cube
+from utils.incremental import CUBE_KEYS_PATH, ROW_KEY, find_new_rows, load_cube_keys, row_key_hashes, save_cube_with_keys
+from utils.incremental import update_consumption_cube
+from utils.loading_funcs import load_bydeler_geodata, read_stromforbruk_csv
+from utils.storage import STAGE_PATHS, read_stage, write_stage
+from utils.transformations import electricity_cleaning_pipeline
+
+
+def load_stored_keys(stage: str = 'bydel') -> pd.DataFrame:
+    if not STAGE_PATHS[stage].exists():
+        return pd.DataFrame(columns=ROW_KEY)
+    return read_stage(STAGE_PATHS[stage], columns=ROW_KEY)
+
+
+def update_address_geo_locations(path: Path, geo_locations: dict) -> None:
+    known = read_json(path) if path.exists() else {}
+    known.update(geo_locations)
+    with open(path, 'w') as f:
+        json.dump(known, f, indent=4)
+
+
+def load_cube_rows_missing(stored_keys: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Stored bydel rows that are not aggregated into the cube yet, and the keys the cube covers.
+
+    A run that crashed after the bydel append but before the cube was saved left
+    such rows behind. A cube saved without its keys is assumed to cover the stored rows.
+    """
+    if CUBE_KEYS_PATH.exists():
+        cube_keys = load_cube_keys(CUBE_KEYS_PATH)
+    elif CUBE_PATH.exists():
+        cube_keys = row_key_hashes(stored_keys)
+    else:
+        cube_keys = np.empty(0, dtype=np.uint64)
+    if np.isin(row_key_hashes(stored_keys), cube_keys).all():
+        return pd.DataFrame(), cube_keys
+    stored_rows = read_stage(STAGE_PATHS['bydel'])
+    return stored_rows[~np.isin(row_key_hashes(stored_rows), cube_keys)], cube_keys
+
+
+def main():
+    """Ingest a new stromforbruk release, processing only rows that are not stored yet."""
+    base_path = Path(__file__).parent
+    release_df = read_stromforbruk_csv(base_path / 'data' / 'stromforbruk.csv')
+    stored_keys = load_stored_keys()
+    new_rows = find_new_rows(release_df, stored_keys)
+    print(f"{len(new_rows)} new rows out of {len(release_df)} in release")
+    missing_rows, cube_keys = load_cube_rows_missing(stored_keys)
+    if not missing_rows.empty:
+        print(f"{len(missing_rows)} stored rows missing from the cube")
+
+    cube_rows = [missing_rows] if not missing_rows.empty else []
+    if not new_rows.empty:
+        geo_locations = get_location_info_per_address(new_rows)
+        update_address_geo_locations(base_path / 'data' / 'address_geo_locations.json', geo_locations)
+        geo_rows = allocate_location_to_el_data(new_rows.copy(), geo_locations)
+        # A run that crashed after the geo append left these rows in geo but not in bydel
+        unstored_geo_rows = find_new_rows(geo_rows, load_stored_keys('geo'))
+        if not unstored_geo_rows.empty:
+            write_stage(unstored_geo_rows, STAGE_PATHS['geo'], append=True)
+
+        bydel_gdf = load_bydeler_geodata(base_path / 'data' / 'Bydeler_Oslo_m_marka.json')
+        bydel_rows = allocate_bydel_to_data_vectorized(geo_rows, bydel_gdf)
+        write_stage(bydel_rows, STAGE_PATHS['bydel'], append=True)
+        cube_rows.append(bydel_rows)
+    if not cube_rows:
+        return
+
+    cube_rows = pd.concat(cube_rows, ignore_index=True)
+    cube = load_cube(CUBE_PATH) if CUBE_PATH.exists() else pd.DataFrame()
+    cleaned_rows = electricity_cleaning_pipeline().run(cube_rows)
+    cube = update_consumption_cube(cube, cleaned_rows)
+    # The keys are saved with the cube, so a crash before this line is caught up on the next run
+    save_cube_with_keys(cube, np.concatenate([cube_keys, row_key_hashes(cube_rows)]))
+
+    if ANOMALY_PATH.exists() and not cleaned_rows.empty:
+        # Re-score only the months the release touched, with the lookback they need
+        since = pd.PeriodIndex.from_fields(year=cleaned_rows['year'], month=cleaned_rows['month'], freq='M').min()
+        anomalies = update_anomalies(cube, since)
+        print(f"Anomalies re-scored from {since}: {len(anomalies)} stored")
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,12 @@ import json
 import pandas as pd
 import geopandas as gpd
 import folium
-import topojson as tp
+from folium.plugins import FastMarkerCluster
 from pathlib import Path
+from typing import Optional
+
+from utils.consumption_cube import CUBE_PATH, load_cube, roll_up
+from utils.loading_funcs import load_bydeler_geodata, load_simplified_bydeler_topojson
 
 TOP_CATEGORIES = [
     "Belysning",
@@ -19,32 +23,19 @@ CATEGORY_COLORS = {
     "Ladestasjoner": "#d62728",   
 }
 
-def load_bydeler_geodata(topojson_path: Path) -> gpd.GeoDataFrame:
-    """Load Oslo bydeler from TopoJSON into a GeoDataFrame."""
-    with open(topojson_path, "r", encoding="utf-8") as f:
-        topo_data = json.load(f)
-
-    topology = tp.Topology(topo_data, object_name="Bydeler")
-    gdf = topology.to_gdf()
-    gdf = gdf.set_crs("EPSG:4326", allow_override=True)
-
-    return gdf
-
-
-def load_and_prepare_electricity_data(csv_path: Path) -> pd.DataFrame:
-    """Load electricity data and aggregate by unique location and category."""
-    df = pd.read_csv(csv_path, engine="python")
-
-    df = df[df["kategori"].isin(TOP_CATEGORIES)].copy()
-    df = df.dropna(subset=["latitude", "longitude"])
-
-    df_locations = (
-        df.groupby(["addresse", "kategori", "latitude", "longitude"])
-        .agg({"forbruk_kwh": "mean"})
-        .reset_index()
+def load_and_prepare_electricity_data(cube_path: Path) -> pd.DataFrame:
+    """Load the consumption cube and aggregate by unique location and category."""
+    cube = load_cube(
+        cube_path,
+        columns=["addresse", "kategori", "latitude", "longitude", "sum", "count", "min", "max"],
+        filters=[("kategori", "in", TOP_CATEGORIES)],
     )
+    cube = cube.dropna(subset=["latitude", "longitude"])
+
+    df_locations = roll_up(cube, ["addresse", "kategori"])
+    df_locations = df_locations.rename(columns={"mean": "forbruk_kwh"})
 
-    return df_locations
+    return df_locations[["addresse", "kategori", "latitude", "longitude", "forbruk_kwh"]]
 
 def create_base_map() -> folium.Map:
     """Create a Folium base map centered on Oslo."""
@@ -55,22 +46,25 @@ def create_base_map() -> folium.Map:
     )
 
 
-def add_bydeler_layer(m: folium.Map, gdf: gpd.GeoDataFrame) -> None:
-    """Add bydeler boundaries to the map."""
-    folium.GeoJson(
-        gdf,
-        style_function=lambda feature: {
-            "fillColor": "none",
-            "color": "#333333",
-            "weight": 2,
-            "fillOpacity": 0,
-        },
-        tooltip=folium.GeoJsonTooltip(
-            fields=["BYDELSNAVN"],
-            aliases=["Bydel:"],
-            localize=True,
-        ),
-    ).add_to(m)
+def add_bydeler_layer(m: folium.Map, gdf: gpd.GeoDataFrame, topojson_data: Optional[dict] = None) -> None:
+    """Add bydeler boundaries to the map, as TopoJSON when topojson_data is given."""
+    style_function = lambda feature: {
+        "fillColor": "none",
+        "color": "#333333",
+        "weight": 2,
+        "fillOpacity": 0,
+    }
+    tooltip = folium.GeoJsonTooltip(
+        fields=["BYDELSNAVN"],
+        aliases=["Bydel:"],
+        localize=True,
+    )
+    if topojson_data is not None:
+        folium.TopoJson(
+            topojson_data, object_path="objects.Bydeler", style_function=style_function, tooltip=tooltip
+        ).add_to(m)
+    else:
+        folium.GeoJson(gdf, style_function=style_function, tooltip=tooltip).add_to(m)
 
 
 def add_location_markers(
@@ -97,6 +91,48 @@ def add_location_markers(
         ).add_to(m)
 
 
+MARKER_CALLBACK = """
+function (row) {
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+        radius: 4, color: %(color)s, fillColor: %(color)s, fillOpacity: 0.7, weight: 1
+    });
+    marker.bindPopup("<b>" + row[2] + "</b><br>Kategori: " + %(category)s
+                     + "<br>Gj.snitt forbruk: " + row[3] + " kWh");
+    marker.bindTooltip(%(category)s);
+    return marker;
+}
+"""
+
+
+def add_location_markers_fast(
+    m: folium.Map,
+    df_locations: pd.DataFrame,
+    category_colors: dict,
+    disable_clustering_at_zoom: int = 16,
+) -> None:
+    """Add one toggleable FastMarkerCluster layer per category.
+
+    Marker payloads are built column-wise and shipped as a single data array per
+    layer; the markers and popups are created in the browser by MARKER_CALLBACK.
+    """
+    payload = pd.DataFrame({
+        "latitude": df_locations["latitude"].round(6),
+        "longitude": df_locations["longitude"].round(6),
+        "addresse": df_locations["addresse"].astype(str),
+        "forbruk_kwh": df_locations["forbruk_kwh"].round(0),
+    })
+    for category, color in category_colors.items():
+        rows = payload[df_locations["kategori"] == category].values.tolist()
+        callback = MARKER_CALLBACK % {"color": json.dumps(color), "category": json.dumps(category)}
+        FastMarkerCluster(
+            rows,
+            callback=callback,
+            name=category,
+            disableClusteringAtZoom=disable_clustering_at_zoom,
+        ).add_to(m)
+    folium.LayerControl(collapsed=False).add_to(m)
+
+
 def add_legend(
     m: folium.Map,
     df_locations: pd.DataFrame,
@@ -111,8 +147,9 @@ def add_legend(
     <p style="margin-bottom: 10px; font-weight: bold;">Kategorier</p>
     """
 
+    counts = df_locations["kategori"].value_counts()
     for category, color in category_colors.items():
-        count = len(df_locations[df_locations["kategori"] == category])
+        count = counts.get(category, 0)
         legend_html += f"""
         <p style="margin: 5px 0;">
             <span style="background-color:{color};
@@ -128,9 +165,10 @@ def add_legend(
 
 def main() -> None:
     path_to_topjson = Path(__file__).parent /  "data" / "Bydeler_Oslo_m_marka.json"
-    path_to_electricity_file = Path(__file__).parent / "data" / "stromforbruk_with_bydel.csv"
+    path_to_electricity_file = CUBE_PATH
     path_to_store_map = Path(__file__).parent / "map_visualisations" / "oslo_electricity_map.html"
     gdf_bydeler = load_bydeler_geodata(path_to_topjson)
+    bydeler_topojson = load_simplified_bydeler_topojson(path_to_topjson)
 
     print("Loading electricity data...")
     df_locations = load_and_prepare_electricity_data(path_to_electricity_file)
@@ -138,8 +176,8 @@ def main() -> None:
     print(f"Plotting {len(df_locations)} unique locations")
 
     m = create_base_map()
-    add_bydeler_layer(m, gdf_bydeler)
-    add_location_markers(m, df_locations, CATEGORY_COLORS)
+    add_bydeler_layer(m, gdf_bydeler, bydeler_topojson)
+    add_location_markers_fast(m, df_locations, CATEGORY_COLORS)
     add_legend(m, df_locations, CATEGORY_COLORS)
 
     m.save(path_to_store_map)
@@ -0,0 +1,31 @@
+import pytest
+
+from allocate_clostest_weather_station import allocate_closest_weather_station
+
+
+def source(station_id, latitude, longitude):
+    return {'id': station_id, 'geometry': {'type': 'Point', 'coordinates': [longitude, latitude]}}
+
+
+def test_station_location_belongs_to_the_nearest_station():
+    stations = {'data': [source('SN18700', 59.94, 10.72), source('SN18950', 59.98, 10.67), source('SN17980', 59.70, 10.80)]}
+    addresses = {'Near Blindern': {'latitude': 59.941, 'longitude': 10.721}, 'No location': {'latitude': None, 'longitude': None}}
+    allocated = allocate_closest_weather_station(addresses, stations)
+
+    assert allocated['Near Blindern']['station_id'] == 'SN18700'
+    assert allocated['Near Blindern']['station_location'] == (59.94, 10.72)
+    assert allocated['Near Blindern']['distance_km'] == pytest.approx(0.124, abs=0.01)
+    assert allocated['No location']['station_id'] is None
+
+
+@pytest.mark.parametrize('weather_stations', [{}, {'data': []}, {'data': [{'id': 'SN18700'}]}])
+def test_every_address_is_allocated_without_stations(weather_stations):
+    addresses = {'Karl Johans gate 1': {'latitude': 59.911, 'longitude': 10.750}}
+    assert allocate_closest_weather_station(addresses, weather_stations) == {
+        'Karl Johans gate 1': {
+            'station_id': None,
+            'station_location': None,
+            'address_location': (59.911, 10.750),
+            'distance_km': None,
+        },
+    }
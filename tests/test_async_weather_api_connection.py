@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from aiohttp import ClientResponseError, web
+
+from api_connections.async_weather_api_connection import AsyncWeatherAPIConnection
+
+
+async def serve(handler):
+    app = web.Application()
+    app.router.add_get('/observations/v0.jsonld', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+
+def observation(time):
+    return {'sourceId': 'SN18700:0', 'referenceTime': time, 'observations': [{'elementId': 'air_temperature', 'value': 1.0}]}
+
+
+def test_failed_request_is_not_replayed():
+    statuses = [500]
+
+    async def handler(request):
+        if statuses:
+            return web.json_response({'error': 'busy'}, status=statuses.pop())
+        return web.json_response({'data': [observation('2020-01-01T00:00:00Z')]})
+
+    async def scenario():
+        runner, base_url = await serve(handler)
+        try:
+            async with AsyncWeatherAPIConnection('id', 'secret', max_retries=0, base_url=base_url) as connection:
+                with pytest.raises(ClientResponseError):
+                    await connection.fetch('SN18700', ['air_temperature'], '2020-01-01', '2020-02-01')
+                result = await connection.fetch('SN18700', ['air_temperature'], '2020-01-01', '2020-02-01')
+                assert len(result['data']) == 1
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+
+
+def test_next_link_pages_are_merged():
+    async def handler(request):
+        page = int(request.query.get('page', 0))
+        body = {'data': [observation(f'2020-01-0{page + 1}T00:00:00Z')]}
+        if page < 2:
+            body['nextLink'] = f"{request.url.with_query({'page': page + 1})}"
+        return web.json_response(body)
+
+    async def scenario():
+        runner, base_url = await serve(handler)
+        try:
+            async with AsyncWeatherAPIConnection('id', 'secret', base_url=base_url) as connection:
+                df = await connection.get_weather_data(['SN18700'], ['air_temperature'], '2020-01-01', '2020-02-01')
+            assert len(df) == 3
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_identical_fetches_share_one_request():
+    hits = []
+
+    async def handler(request):
+        hits.append(request.query['sources'])
+        await asyncio.sleep(0.05)
+        return web.json_response({'data': [observation('2020-01-01T00:00:00Z')]})
+
+    async def scenario():
+        runner, base_url = await serve(handler)
+        try:
+            async with AsyncWeatherAPIConnection('id', 'secret', base_url=base_url) as connection:
+                results = await asyncio.gather(*[
+                    connection.fetch('SN18700', ['air_temperature'], '2020-01-01', '2020-02-01') for _ in range(5)
+                ])
+            assert hits == ['SN18700']
+            assert all(result is results[0] for result in results)
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+
+
+def test_finished_requests_are_not_kept():
+    headers = []
+
+    async def handler(request):
+        headers.append(request.headers.get('Authorization'))
+        return web.json_response({'data': [observation('2020-01-01T00:00:00Z')]})
+
+    async def scenario():
+        runner, base_url = await serve(handler)
+        try:
+            async with AsyncWeatherAPIConnection('id', 'secret', base_url=base_url) as connection:
+                await connection.fetch('SN18700', ['air_temperature'], '2020-01-01', '2020-02-01')
+                assert not connection._requests
+                await connection.fetch('SN18700', ['air_temperature'], '2020-01-01', '2020-02-01')
+            assert headers == ['Basic aWQ6c2VjcmV0'] * 2
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(scenario())
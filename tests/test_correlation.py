@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from utils.correlation import correlation_table
+
+
+def test_spearman_matches_scipy_for_lagged_gappy_series():
+    rng = np.random.default_rng(0)
+    index = pd.period_range('2015-01', periods=60, freq='M')
+    temperature = rng.normal(5, 8, 60)
+    consumption = pd.DataFrame({
+        'Belysning': 100 - 2 * temperature + rng.normal(0, 5, 60),
+        'Trafikkstyring': rng.gamma(2.0, 50.0, 60),
+    }, index=index)
+    weather = pd.DataFrame({'air_temperature': temperature, 'precipitation': rng.gamma(1.0, 3.0, 60)}, index=index)
+    consumption.iloc[rng.choice(60, 12, replace=False), 0] = np.nan
+    consumption.iloc[rng.choice(60, 5, replace=False), 1] = np.nan
+    weather.iloc[rng.choice(60, 8, replace=False), 0] = np.nan
+
+    table = correlation_table(consumption, weather, lags=(0, 3, -2))
+    for row in table.itertuples():
+        x = consumption[row.series].to_numpy()
+        y = weather[row.element].shift(row.lag).to_numpy()
+        expected = stats.spearmanr(x, y, nan_policy='omit')
+        assert row.spearman_r == pytest.approx(expected.statistic, abs=1e-12)
+        assert row.n == np.count_nonzero(~np.isnan(x) & ~np.isnan(y))
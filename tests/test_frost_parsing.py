@@ -0,0 +1,15 @@
+from api_connections.frost_parsing import flatten_observations, pivot_observations
+from analyse_electricity_weather import weather_data_to_dataframe
+
+
+def test_empty_response_gives_typed_columns():
+    observations = flatten_observations([])
+    assert observations.empty
+    assert observations['referenceTime'].dtype.kind == 'M'
+    assert pivot_observations(observations, ['air_temperature'])['referenceTime'].dtype.kind == 'M'
+
+
+def test_empty_response_parses_to_empty_weather_frame():
+    weather_df = weather_data_to_dataframe({'data': []})
+    assert weather_df.empty
+    assert {'year_month', 'month', 'mean_air_temp'} <= set(weather_df.columns)
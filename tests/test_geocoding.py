@@ -0,0 +1,87 @@
+import pytest
+
+from utils.geocoding import GeocodingCache, resolve_addresses
+
+
+class StubGeocoder:
+    """Local stand-in for Nominatim that records every address it is asked for."""
+
+    def __init__(self, fail_on=(), abort_on=()):
+        self.calls = []
+        self.fail_on = set(fail_on)
+        self.abort_on = set(abort_on)
+
+    def __call__(self, address):
+        self.calls.append(address)
+        if address in self.abort_on:
+            raise Abort(address)
+        if address in self.fail_on:
+            raise RuntimeError(f"lookup failed for {address}")
+        number = int(address.split()[-1])
+        return 59.9 + number / 1000, 10.7 + number / 1000
+
+
+class Abort(BaseException):
+    """Stops the run the way a crash or Ctrl-C would, past the per-address error handling."""
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = GeocodingCache(tmp_path / 'geocoding_cache.sqlite')
+    yield cache
+    cache.close()
+
+
+def resolve(addresses, cache, geocoder, batch_size=2):
+    return resolve_addresses(addresses, cache, geocode=geocoder, batch_size=batch_size, max_workers=1, min_interval=0)
+
+
+def test_only_cache_misses_are_geocoded(cache):
+    cache.put_many({'Gate 1': (59.901, 10.701)})
+    geocoder = StubGeocoder()
+    result = resolve(['Gate 1', 'Gate 2', 'Gate 3'], cache, geocoder)
+    assert geocoder.calls == ['Gate 2', 'Gate 3']
+    assert result['Gate 1'] == (59.901, 10.701)
+    assert result['Gate 3'] == (59.903, 10.703)
+
+
+def test_normalized_duplicates_are_geocoded_once(cache):
+    geocoder = StubGeocoder()
+    result = resolve(['Gate 1', '  gate   1 ', 'GATE 1', 'Gate 2'], cache, geocoder)
+    assert sorted(geocoder.calls) == ['Gate 1', 'Gate 2']
+    assert result['  gate   1 '] == result['GATE 1'] == result['Gate 1']
+    assert len(cache) == 2
+
+
+def test_failed_lookup_keeps_the_batch_checkpoint(cache):
+    geocoder = StubGeocoder(fail_on={'Gate 3'})
+    result = resolve([f'Gate {i}' for i in range(1, 6)], cache, geocoder)
+    assert result['Gate 3'] == (None, None)
+    assert 'Gate 3' not in cache
+    assert all(f'Gate {i}' in cache for i in (1, 2, 4, 5))
+
+    retry = StubGeocoder()
+    resolve([f'Gate {i}' for i in range(1, 6)], cache, retry)
+    assert retry.calls == ['Gate 3']
+
+
+def test_aborted_run_keeps_completed_batches(cache):
+    addresses = [f'Gate {i}' for i in range(1, 7)]
+    with pytest.raises(Abort):
+        resolve(addresses, cache, StubGeocoder(abort_on={'Gate 4'}))
+    assert 'Gate 1' in cache and 'Gate 2' in cache
+    assert 'Gate 4' not in cache
+
+    resumed = StubGeocoder()
+    resolve(addresses, cache, resumed)
+    assert 'Gate 1' not in resumed.calls and 'Gate 2' not in resumed.calls
+    assert 'Gate 4' in resumed.calls
+
+
+def test_rerun_makes_no_geocoder_calls(cache):
+    addresses = [f'Gate {i}' for i in range(1, 6)]
+    first = resolve(addresses, cache, StubGeocoder())
+    rerun_geocoder = StubGeocoder()
+    rerun = resolve(addresses, cache, rerun_geocoder)
+    assert rerun_geocoder.calls == []
+    assert rerun == first
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from utils.consumption_cube import CUBE_DIMENSIONS, build_consumption_cube
+from utils.incremental import find_new_rows, load_cube_keys, row_key_hashes, save_cube_with_keys, update_consumption_cube
+from utils.transformations import add_date_columns
+
+
+def make_rows(n_rows: int = 4000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    address = rng.integers(0, 50, n_rows)
+    df = pd.DataFrame({
+        'addresse': [f'Adresse {i}' for i in address],
+        'dato': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 730, n_rows), 'D'),
+        'kategori': rng.choice(['Belysning', 'Trafikkstyring'], n_rows),
+        'forbruk_kwh': rng.gamma(2.0, 100.0, n_rows),
+        'BYDELSNAVN': np.where(address % 5 == 0, None, [f'Bydel {i % 3}' for i in address]),
+        'latitude': 59.9 + address / 1000,
+        'longitude': 10.7 + address / 1000,
+    })
+    return add_date_columns(df.drop_duplicates(['addresse', 'dato', 'kategori'], ignore_index=True))
+
+
+def sorted_cube(cube: pd.DataFrame) -> pd.DataFrame:
+    cube = cube.astype({c: object for c in ['kategori', 'BYDELSNAVN', 'addresse']})
+    return cube.sort_values(CUBE_DIMENSIONS, ignore_index=True)[sorted(cube.columns)]
+
+
+def test_incremental_update_matches_full_rebuild():
+    rows = make_rows()
+    first_release = rows.iloc[:2500]
+    second_release = rows.iloc[2000:]  # overlaps the first release
+    new_rows = find_new_rows(second_release, first_release)
+    assert len(new_rows) == len(rows) - 2500
+
+    incremental = update_consumption_cube(build_consumption_cube(first_release), new_rows)
+    pd.testing.assert_frame_equal(sorted_cube(incremental), sorted_cube(build_consumption_cube(rows)))
+
+
+def test_cube_keys_round_trip(tmp_path):
+    rows = make_rows(100)
+    hashes = row_key_hashes(rows)
+    save_cube_with_keys(build_consumption_cube(rows), np.concatenate([hashes, hashes[:10]]),
+                        tmp_path / 'cube.parquet', tmp_path / 'keys.parquet')
+    assert (tmp_path / 'cube.parquet').exists()
+    np.testing.assert_array_equal(load_cube_keys(tmp_path / 'keys.parquet'), np.unique(hashes))
+    assert len(load_cube_keys(tmp_path / 'missing.parquet')) == 0
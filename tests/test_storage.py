@@ -0,0 +1,35 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.storage import PARTITION_COLUMNS, apply_stage_schema, read_stage, write_stage
+
+
+def readings(n_addresses: int, offset: int = 0) -> pd.DataFrame:
+    return pd.DataFrame({
+        'addresse': [f'Adresse {i + offset}' for i in range(n_addresses)],
+        'dato': pd.Timestamp('2020-01-01'),
+        'kategori': 'Belysning',
+        'forbruk_kwh': 1.0,
+    })
+
+
+def test_append_with_more_categories_than_stored_index_holds(tmp_path):
+    path = tmp_path / 'stage'
+    write_stage(readings(3), path)
+    write_stage(readings(300, offset=3), path, append=True)
+    df = read_stage(path)
+    assert len(df) == 303
+    assert df['addresse'].nunique() == 303
+    assert isinstance(df['kategori'].dtype, pd.CategoricalDtype)
+
+
+def test_reads_stage_with_narrow_legacy_index(tmp_path):
+    path = tmp_path / 'stage'
+    legacy = pa.Table.from_pandas(apply_stage_schema(readings(3)), preserve_index=False)
+    assert legacy.schema.field('addresse').type.index_type == pa.int8()
+    pq.write_to_dataset(legacy, root_path=str(path), partition_cols=PARTITION_COLUMNS)
+    write_stage(readings(300, offset=3), path, append=True)
+    df = read_stage(path, columns=['addresse', 'year'], filters=[('year', '==', 2020)])
+    assert sorted(df['addresse']) == sorted(f'Adresse {i}' for i in range(303))
+    assert df['year'].dtype == 'int16'
@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+
+from utils.transformations import clean_data_from_outliers
+
+
+def test_rows_without_group_key_get_no_bounds():
+    df = pd.DataFrame({'kategori': [None, None], 'forbruk_kwh': [1.0, np.nan]})
+    assert clean_data_from_outliers(df).empty
+    pd.testing.assert_frame_equal(clean_data_from_outliers(df, keep_nan=True), df.iloc[[1]])
+
+
+def test_matches_groupby_transform():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'kategori': rng.choice(['Belysning', 'Trafikkstyring', None], 5000),
+        'forbruk_kwh': np.where(rng.random(5000) < 0.02, 1e6, rng.gamma(2.0, 100.0, 5000)),
+    })
+    grouped = df.groupby('kategori')['forbruk_kwh']
+    q1, q3 = grouped.transform(lambda s: s.quantile(0.01)), grouped.transform(lambda s: s.quantile(0.99))
+    iqr = q3 - q1
+    expected = df[(df['forbruk_kwh'] >= q1 - 1.5 * iqr) & (df['forbruk_kwh'] <= q3 + 1.5 * iqr)]
+    pd.testing.assert_frame_equal(clean_data_from_outliers(df), expected)
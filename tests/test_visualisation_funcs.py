@@ -0,0 +1,32 @@
+import geopandas as gpd
+import pandas as pd
+import topojson as tp
+from shapely.geometry import box
+
+from utils.visualisation_funcs import attach_properties_to_topojson, create_average_map
+
+
+def bydel_grid(n: int = 3) -> gpd.GeoDataFrame:
+    return gpd.GeoDataFrame(
+        {'BYDELSNAVN': [f'Bydel {i}' for i in range(n)]},
+        geometry=[box(10.6 + 0.1 * i, 59.8, 10.7 + 0.1 * i, 59.9) for i in range(n)],
+        crs='EPSG:4326',
+    )
+
+
+def test_unmatched_geometry_gets_every_column_as_none():
+    topology = tp.Topology(bydel_grid(), object_name='Bydeler').to_dict()
+    df = pd.DataFrame({'Bydel': ['Bydel 1', 'Bydel 2'], 'forbruk_kwh': [10.0, 20.0]})
+    geometries = attach_properties_to_topojson(topology, df, 'BYDELSNAVN', 'Bydel')['objects']['Bydeler']['geometries']
+    properties = {g['properties']['BYDELSNAVN']: g['properties'] for g in geometries}
+    assert properties['Bydel 0']['forbruk_kwh'] is None
+    assert properties['Bydel 2']['forbruk_kwh'] == 20.0
+
+
+def test_average_map_renders_with_unmatched_first_district(tmp_path):
+    gdf = bydel_grid()
+    topology = tp.Topology(gdf, object_name='Bydeler').to_dict()
+    # Bydel 0 comes first and has no consumption, like Marka without Ladestasjoner
+    avg_df = pd.DataFrame({'Bydel': ['Bydel 1', 'Bydel 2'], 'forbruk_kwh': [10.0, 20.0]})
+    output_path = create_average_map(gdf, avg_df, tmp_path / 'average_map.html', topojson_data=topology)
+    assert output_path.exists()
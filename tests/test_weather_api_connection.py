@@ -0,0 +1,198 @@
+import json
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+
+from api_connections.observation_cache import ObservationCache
+from api_connections.weather_api_connection import WeatherAPIConnection
+
+
+class StubFrost:
+    """Local HTTP server standing in for Frost; respond(path, query) returns (status, headers, body)."""
+
+    def __init__(self):
+        self.requests = []
+        self.respond = lambda path, query: (200, {}, {'data': []})
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                stub.requests.append((url.path, query))
+                status, headers, body = stub.respond(url.path, query)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def frost():
+    stub = StubFrost()
+    yield stub
+    stub.close()
+
+
+@pytest.fixture
+def connection(frost):
+    with WeatherAPIConnection('id', 'secret', timeout=5, backoff_factor=0, max_workers=2, base_url=frost.url) as connection:
+        yield connection
+
+
+def observation(source, time):
+    return {'sourceId': f'{source}:0', 'referenceTime': time, 'observations': [{'elementId': 'air_temperature', 'value': 1.0}]}
+
+
+def test_retries_429_with_retry_after_and_5xx(frost, connection):
+    statuses = [(429, {'Retry-After': '1'}), (503, {}), (500, {})]
+
+    def respond(path, query):
+        if statuses:
+            status, headers = statuses.pop(0)
+            return status, headers, {'error': 'busy'}
+        return 200, {}, {'data': [observation('SN18700', '2020-01-01T00:00:00Z')]}
+
+    frost.respond = respond
+    start = time.monotonic()
+    result = connection.get_sources({'ids': 'SN18700'})
+    assert time.monotonic() - start >= 0.9
+    assert len(frost.requests) == 4
+    assert len(result['data']) == 1
+
+
+def test_404_returns_empty_data(frost, connection):
+    frost.respond = lambda path, query: (404, {}, {'error': {'reason': 'No data found'}})
+    result = connection.get_weather_data(['SN18700'], ['air_temperature'], '2020-01-01', '2020-02-01')
+    assert result['data'] == []
+    assert len(frost.requests) == 1
+
+
+def test_next_link_pages_are_merged(frost, connection):
+    def respond(path, query):
+        page = int(query.get('page', 0))
+        body = {'data': [observation('SN18700', f'2020-01-0{page + 1}T00:00:00Z')]}
+        if page < 2:
+            body['nextLink'] = f"{frost.url}/observations/v0.jsonld?page={page + 1}"
+        return 200, {}, body
+
+    frost.respond = respond
+    result = connection.get_weather_data(['SN18700'], ['air_temperature'], '2020-01-01', '2020-02-01')
+    assert [item['referenceTime'] for item in result['data']] == [
+        '2020-01-01T00:00:00Z', '2020-01-02T00:00:00Z', '2020-01-03T00:00:00Z'
+    ]
+    assert 'nextLink' not in result
+    assert result['totalItemCount'] == 3
+
+
+def test_requests_are_split_by_source_group_and_time_window(frost, connection):
+    def respond(path, query):
+        first_source = query['sources'].split(',')[0]
+        return 200, {}, {'data': [observation(first_source, query['referencetime'].split('/')[0])]}
+
+    frost.respond = respond
+    sources = ['SN1', 'SN2', 'SN3', 'SN4', 'SN5']
+    result = connection.get_weather_data(sources, ['air_temperature'], '2020-01-01', '2022-01-01', sources_per_request=2)
+
+    requested = sorted((query['sources'], query['referencetime']) for _, query in frost.requests)
+    windows = ['2020-01-01T00:00:00/2021-01-01T00:00:00', '2021-01-01T00:00:00/2022-01-01T00:00:00']
+    assert requested == sorted((group, window) for group in ['SN1,SN2', 'SN3,SN4', 'SN5'] for window in windows)
+    # Chunks come back in order: source group first, then time
+    assert [item['sourceId'] for item in result['data']] == ['SN1:0', 'SN1:0', 'SN3:0', 'SN3:0', 'SN5:0', 'SN5:0']
+
+
+def paged_observations(frost):
+    def respond(path, query):
+        page = int(query.get('page', 0))
+        body = {'data': [observation('SN18700', f'2020-01-0{page + 1}T00:00:00Z')]}
+        if page < 2:
+            body['nextLink'] = f"{frost.url}/observations/v0.jsonld?page={page + 1}"
+        return 200, {}, body
+    return respond
+
+
+def test_streaming_follows_next_link(frost, connection):
+    frost.respond = paged_observations(frost)
+    frames = list(connection.iter_observations(['SN18700'], ['air_temperature'], '2020-01-01', '2020-02-01', batch_size=2))
+    assert [len(df) for df in frames] == [2, 1]
+    assert len(frost.requests) == 3
+
+
+def test_streaming_fills_and_reuses_the_cache(frost, tmp_path):
+    frost.respond = paged_observations(frost)
+    cache = ObservationCache(tmp_path / 'observations.sqlite')
+    with WeatherAPIConnection('id', 'secret', timeout=5, backoff_factor=0, base_url=frost.url, cache=cache) as connection:
+        first = list(connection.iter_observations(['SN18700'], ['air_temperature'], '2020-01-01', '2020-02-01'))
+        requests_after_first = len(frost.requests)
+        second = list(connection.iter_observations(['SN18700'], ['air_temperature'], '2020-01-01', '2020-02-01'))
+    cache.close()
+    assert requests_after_first == 3
+    assert len(frost.requests) == requests_after_first
+    assert sum(len(df) for df in first) == sum(len(df) for df in second) == 3
+
+
+def observation_per_window(path, query):
+    return 200, {}, {'data': [observation('SN18700', query['referencetime'].split('/')[0] + 'Z')]}
+
+
+@pytest.fixture
+def cached_connection(frost, tmp_path):
+    with ObservationCache(tmp_path / 'observations.sqlite') as cache:
+        with WeatherAPIConnection('id', 'secret', timeout=5, backoff_factor=0, base_url=frost.url, cache=cache) as connection:
+            yield connection
+
+
+def test_widened_range_fetches_only_the_missing_intervals(frost, cached_connection):
+    frost.respond = observation_per_window
+    cached_connection.get_weather_data(['SN18700'], ['air_temperature'], '2020-01-01', '2020-02-01')
+    frost.requests.clear()
+    result = cached_connection.get_weather_data(['SN18700'], ['air_temperature'], '2019-12-01', '2020-03-01')
+
+    assert sorted(query['referencetime'] for _, query in frost.requests) == [
+        '2019-12-01T00:00:00/2020-01-01T00:00:00', '2020-02-01T00:00:00/2020-03-01T00:00:00'
+    ]
+    assert [item['referenceTime'] for item in result['data']] == [
+        '2019-12-01T00:00:00', '2020-01-01T00:00:00', '2020-02-01T00:00:00'
+    ]
+
+
+def test_empty_ranges_are_not_requested_again(frost, cached_connection):
+    frost.respond = lambda path, query: (404, {}, {'error': {'reason': 'No data found'}})
+    for _ in range(2):
+        result = cached_connection.get_weather_data(['SN18700'], ['air_temperature'], '2020-01-01', '2020-02-01')
+        assert result['data'] == []
+    assert len(frost.requests) == 1
+
+
+@pytest.mark.parametrize('ttl, expected_requests', [(timedelta(days=1), 1), (timedelta(0), 2)])
+def test_recent_months_expire_after_ttl(frost, tmp_path, ttl, expected_requests):
+    frost.respond = observation_per_window
+    end = pd.Timestamp.now(tz='UTC').tz_localize(None).normalize()
+    start = end - pd.DateOffset(months=1)
+    with ObservationCache(tmp_path / 'observations.sqlite', ttl=ttl) as cache:
+        with WeatherAPIConnection('id', 'secret', timeout=5, backoff_factor=0, base_url=frost.url, cache=cache) as connection:
+            for _ in range(2):
+                connection.get_weather_data(['SN18700'], ['air_temperature'], start.isoformat(), end.isoformat())
+    assert len(frost.requests) == expected_requests
+    assert {query['referencetime'] for _, query in frost.requests} == {f'{start.isoformat()}/{end.isoformat()}'}
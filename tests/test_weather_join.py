@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+
+from utils.weather_join import StationWeather
+
+
+def test_sensors_of_one_station_are_collapsed():
+    weather = pd.DataFrame({
+        'sourceId': ['SN18700:0', 'SN18700:1', 'SN18700:0', 'SN18700:1', 'SN4780:0', None],
+        'referenceTime': pd.to_datetime(['2020-01-01', '2020-01-01', '2020-01-02', '2020-01-02', '2020-01-01', '2020-01-01']),
+        'air_temperature': [1.0, np.nan, 2.0, np.nan, -3.0, 9.0],
+        'cloud_area_fraction': [np.nan, 5.0, np.nan, 6.0, 7.0, 9.0],
+    })
+    station_weather = StationWeather(weather, ['air_temperature', 'cloud_area_fraction'])
+
+    exact = station_weather.lookup(['SN18700', 'SN18700:0', 'SN4780', 'SN99999'], ['2020-01-01', '2020-01-02', '2020-01-01', '2020-01-01'])
+    expected = pd.DataFrame({'air_temperature': [1.0, 2.0, -3.0, np.nan], 'cloud_area_fraction': [5.0, 6.0, 7.0, np.nan]})
+    pd.testing.assert_frame_equal(exact, expected)
+
+    backward = station_weather.lookup(['SN18700'], ['2020-01-05'], how='backward')
+    pd.testing.assert_frame_equal(backward, pd.DataFrame({'air_temperature': [2.0], 'cloud_area_fraction': [6.0]}))
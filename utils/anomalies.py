@@ -0,0 +1,164 @@
+from pathlib import Path
+from typing import Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.consumption_cube import roll_up
+from utils.storage import DATA_PATH
+
+ANOMALY_PATH = DATA_PATH / 'consumption_anomalies.parquet'
+
+METER_COLUMNS = ['addresse', 'kategori']
+WINDOW_MONTHS = 12
+MIN_HISTORY_MONTHS = 6
+Z_THRESHOLD = 5.0
+FLATLINE_MONTHS = 4
+# 1.4826 * MAD estimates the standard deviation for normally distributed values
+MAD_SCALE = 1.4826
+# Floor on the scale, as a share of the baseline, so near-constant meters are not flagged for noise
+MIN_RELATIVE_SCALE = 0.05
+CHUNK_METERS = 4096
+
+PeriodLike = Union[pd.Period, str]
+
+
+def meter_month_matrix(
+    cube: pd.DataFrame,
+    measure: str = 'mean',
+    meter_columns: Sequence[str] = METER_COLUMNS,
+) -> Tuple[pd.DataFrame, pd.PeriodIndex, np.ndarray]:
+    """Monthly consumption as a dense (meters, months) matrix, NaN where a meter has no readings.
+
+    The default measure is the monthly mean forbruk_kwh per reading (cube sum /
+    count), so a month with fewer readings does not look like a drop. Returns the
+    meter keys, the months and the matrix.
+    """
+    monthly = roll_up(cube, list(meter_columns) + ['year', 'month'])
+    meter_codes = monthly.groupby(list(meter_columns), observed=True, sort=True).ngroup().to_numpy()
+    month_index = monthly['year'].to_numpy(dtype=np.int64) * 12 + monthly['month'].to_numpy(dtype=np.int64) - 1
+    first = month_index.min() if len(month_index) else 0
+    n_months = month_index.max() - first + 1 if len(month_index) else 0
+
+    matrix = np.full((meter_codes.max() + 1 if len(meter_codes) else 0, n_months), np.nan)
+    matrix[meter_codes, month_index - first] = monthly[measure].to_numpy(dtype=float)
+    meters = (
+        monthly[list(meter_columns)].assign(_code=meter_codes)
+        .drop_duplicates('_code').sort_values('_code').drop(columns='_code').reset_index(drop=True)
+    )
+    periods = pd.period_range(pd.Period(year=first // 12, month=first % 12 + 1, freq='M'), periods=n_months, freq='M')
+    return meters, periods, matrix
+
+
+def _window_median(windows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Median and number of observed values over the last axis, ignoring NaN."""
+    ordered = np.sort(windows, axis=-1)  # NaN sorts last
+    n = np.count_nonzero(~np.isnan(windows), axis=-1)
+    low = np.take_along_axis(ordered, np.maximum((n - 1) // 2, 0)[..., None], axis=-1)[..., 0]
+    high = np.take_along_axis(ordered, (n // 2)[..., None], axis=-1)[..., 0]
+    return np.where(n > 0, (low + high) / 2, np.nan), n
+
+
+def rolling_median_mad(matrix: np.ndarray, window: int = WINDOW_MONTHS) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Trailing median, MAD and number of observed months over the window months before each month.
+
+    The month itself is left out, so a spike does not pull its own baseline up.
+    """
+    padded = np.concatenate([np.full((len(matrix), window), np.nan), matrix[:, :-1]], axis=1)
+    median = np.empty_like(matrix)
+    mad = np.empty_like(matrix)
+    n = np.empty(matrix.shape, dtype=np.int64)
+    # Chunked over meters to keep the (meters, months, window) views small
+    for start in range(0, len(matrix), CHUNK_METERS):
+        windows = sliding_window_view(padded[start:start + CHUNK_METERS], window, axis=1)
+        chunk_median, n[start:start + CHUNK_METERS] = _window_median(windows)
+        median[start:start + CHUNK_METERS] = chunk_median
+        mad[start:start + CHUNK_METERS], _ = _window_median(np.abs(windows - chunk_median[..., None]))
+    return median, mad, n
+
+
+def flatline_run_length(matrix: np.ndarray) -> np.ndarray:
+    """Number of consecutive months, up to and including each month, with exactly the same value."""
+    months = np.arange(matrix.shape[1])
+    same = np.zeros(matrix.shape, dtype=bool)
+    same[:, 1:] = matrix[:, 1:] == matrix[:, :-1]  # NaN never equals, so gaps break a run
+    run_start = np.maximum.accumulate(np.where(same, 0, months), axis=1)
+    return np.where(np.isnan(matrix), 0, months - run_start + 1)
+
+
+def detect_anomalies(
+    cube: pd.DataFrame,
+    since: Optional[PeriodLike] = None,
+    measure: str = 'mean',
+    window: int = WINDOW_MONTHS,
+    min_history: int = MIN_HISTORY_MONTHS,
+    z_threshold: float = Z_THRESHOLD,
+    flatline_months: int = FLATLINE_MONTHS,
+) -> pd.DataFrame:
+    """Flag meter-months that break with the meter's own history.
+
+    Each addresse x kategori is compared with the rolling median and MAD of its
+    previous window months. reason is 'spike' or 'drop' when the robust z-score
+    exceeds z_threshold, else 'flatline' when the value has repeated exactly for
+    flatline_months months. Only months from since onwards are reported; the cube
+    needs history_months(window, flatline_months) months before since (see
+    cube_for_detection). Returns one row per flagged meter-month.
+    """
+    meters, periods, matrix = meter_month_matrix(cube, measure)
+    median, mad, n_history = rolling_median_mad(matrix, window)
+    scale = np.maximum(MAD_SCALE * mad, MIN_RELATIVE_SCALE * np.abs(median))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        robust_z = (matrix - median) / scale
+    robust_z[n_history < min_history] = np.nan
+    run_length = flatline_run_length(matrix)
+
+    reason = np.full(matrix.shape, '', dtype=object)
+    reason[run_length >= flatline_months] = 'flatline'
+    reason[robust_z < -z_threshold] = 'drop'
+    reason[robust_z > z_threshold] = 'spike'
+    if since is not None:
+        reason[:, periods < pd.Period(since, freq='M')] = ''
+
+    meter_rows, month_columns = np.nonzero(reason != '')
+    flagged_periods = periods[month_columns]
+    anomalies = meters.iloc[meter_rows].reset_index(drop=True)
+    anomalies['year'] = flagged_periods.year.astype('int16')
+    anomalies['month'] = flagged_periods.month.astype('int8')
+    anomalies['value'] = matrix[meter_rows, month_columns]
+    anomalies['baseline'] = median[meter_rows, month_columns]
+    anomalies['robust_z'] = robust_z[meter_rows, month_columns]
+    anomalies['flatline_months'] = run_length[meter_rows, month_columns]
+    anomalies['reason'] = pd.Categorical(reason[meter_rows, month_columns], categories=['spike', 'drop', 'flatline'])
+    return anomalies
+
+
+def history_months(window: int = WINDOW_MONTHS, flatline_months: int = FLATLINE_MONTHS) -> int:
+    """Months of history before since that detect_anomalies needs to score since like a full run."""
+    return max(window, flatline_months - 1)
+
+
+def cube_for_detection(cube: pd.DataFrame, since: PeriodLike, window: int = WINDOW_MONTHS) -> pd.DataFrame:
+    """Cube cells from the start of the lookback window before since onwards."""
+    start = pd.Period(since, freq='M') - history_months(window)
+    month_index = cube['year'].astype(np.int64) * 12 + cube['month'].astype(np.int64) - 1
+    return cube[month_index >= start.year * 12 + start.month - 1]
+
+
+def update_anomalies(cube: pd.DataFrame, since: PeriodLike, path: Path = ANOMALY_PATH) -> pd.DataFrame:
+    """Re-score the months from since onwards and replace them in the stored anomalies.
+
+    Only the lookback window of history before since is scanned, so appending a
+    release costs a few months of work, not the full history. Flatline runs longer
+    than the lookback are reported with a capped flatline_months.
+    """
+    since = pd.Period(since, freq='M')
+    new_anomalies = detect_anomalies(cube_for_detection(cube, since), since=since)
+    if path.exists():
+        stored = pd.read_parquet(path)
+        stored_periods = pd.PeriodIndex.from_fields(year=stored['year'], month=stored['month'], freq='M')
+        stored = stored[stored_periods < since]
+        new_anomalies = pd.concat([stored, new_anomalies], ignore_index=True)
+        for column in METER_COLUMNS:
+            new_anomalies[column] = new_anomalies[column].astype('category')
+    new_anomalies.to_parquet(path, index=False)
+    return new_anomalies
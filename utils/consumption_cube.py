@@ -0,0 +1,56 @@
+from pathlib import Path
+from typing import List, Optional, Sequence
+import pandas as pd
+
+from utils.storage import DATA_PATH, Filter
+
+CUBE_PATH = DATA_PATH / 'consumption_cube.parquet'
+
+CUBE_DIMENSIONS = ['kategori', 'BYDELSNAVN', 'year', 'month', 'addresse']
+CUBE_MEASURES = ['sum', 'count', 'min', 'max']
+LOCATION_COLUMNS = ['latitude', 'longitude']
+
+
+def build_consumption_cube(df: pd.DataFrame, dimensions: Sequence[str] = CUBE_DIMENSIONS) -> pd.DataFrame:
+    """Aggregate forbruk_kwh to one row per kategori x bydel x year x month x addresse.
+
+    Expects year and month columns (see add_date_columns). Missing bydel is kept as
+    its own group. Each cell also carries the address coordinates when available.
+    """
+    grouped = df.groupby(list(dimensions), observed=True, dropna=False, sort=False)
+    cube = grouped['forbruk_kwh'].agg(CUBE_MEASURES)
+    locations = [c for c in LOCATION_COLUMNS if c in df.columns]
+    if locations:
+        cube = cube.join(grouped[locations].first())
+    cube['mean'] = cube['sum'] / cube['count']
+    return cube.reset_index()
+
+
+def save_cube(cube: pd.DataFrame, path: Path = CUBE_PATH) -> None:
+    cube.to_parquet(path, index=False)
+
+
+def load_cube(path: Path = CUBE_PATH, columns: Optional[List[str]] = None, filters: Optional[List[Filter]] = None) -> pd.DataFrame:
+    return pd.read_parquet(path, columns=columns, filters=filters)
+
+
+def slice_cube(cube: pd.DataFrame, **criteria) -> pd.DataFrame:
+    """Select cells by dimension value, e.g. slice_cube(cube, kategori='Belysning', year=[2020, 2021])."""
+    mask = pd.Series(True, index=cube.index)
+    for dimension, value in criteria.items():
+        if isinstance(value, (list, tuple, set)):
+            mask &= cube[dimension].isin(value)
+        else:
+            mask &= cube[dimension] == value
+    return cube[mask]
+
+
+def roll_up(cube: pd.DataFrame, dimensions: Sequence[str], dropna: bool = True) -> pd.DataFrame:
+    """Aggregate cube cells to the given dimensions; mean is recomputed from sum and count."""
+    grouped = cube.groupby(list(dimensions), observed=True, dropna=dropna)
+    rolled = grouped.agg(sum=('sum', 'sum'), count=('count', 'sum'), min=('min', 'min'), max=('max', 'max'))
+    rolled['mean'] = rolled['sum'] / rolled['count']
+    locations = [c for c in LOCATION_COLUMNS if c in cube.columns]
+    if locations and 'addresse' in dimensions:
+        rolled = rolled.join(grouped[locations].first())
+    return rolled.reset_index()
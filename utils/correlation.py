@@ -0,0 +1,177 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from utils.consumption_cube import roll_up
+
+
+def monthly_consumption_matrix(
+    cube: pd.DataFrame,
+    series_dimensions: Sequence[str] = ('kategori', 'BYDELSNAVN'),
+    measure: str = 'mean',
+) -> pd.DataFrame:
+    """Monthly consumption with one column per combination of series_dimensions, indexed by year_month."""
+    monthly = roll_up(cube, list(series_dimensions) + ['year', 'month'])
+    monthly['year_month'] = pd.PeriodIndex.from_fields(year=monthly['year'], month=monthly['month'], freq='M')
+    return monthly.pivot_table(index='year_month', columns=list(series_dimensions), values=measure, observed=True)
+
+
+def _centered(matrix: np.ndarray) -> np.ndarray:
+    # Centering first keeps the sum-of-products formulas below numerically stable
+    with np.errstate(invalid='ignore'):
+        return matrix - np.nanmean(matrix, axis=0, keepdims=True)
+
+
+def pairwise_pearson(x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Pearson r and sample size for every column of x against every column of y.
+
+    x is (time, series) and y is (time, elements); each pair uses the time steps
+    where both are observed. Returns two (series, elements) arrays.
+    """
+    x, y = _centered(x), _centered(y)
+    x_mask, y_mask = ~np.isnan(x), ~np.isnan(y)
+    x0, y0 = np.where(x_mask, x, 0.0), np.where(y_mask, y, 0.0)
+    xm, ym = x_mask.astype(float), y_mask.astype(float)
+
+    n = xm.T @ ym
+    sum_x, sum_y = x0.T @ ym, xm.T @ y0
+    sum_xx, sum_yy = (x0 ** 2).T @ ym, xm.T @ (y0 ** 2)
+    sum_xy = x0.T @ y0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = n * sum_xy - sum_x * sum_y
+        r = covariance / np.sqrt((n * sum_xx - sum_x ** 2) * (n * sum_yy - sum_y ** 2))
+    r[n < 3] = np.nan
+    return np.clip(r, -1.0, 1.0), n
+
+
+def correlation_p_values(r: np.ndarray, n: np.ndarray) -> np.ndarray:
+    """Two-sided p-values for H0: r = 0, from the t distribution with n - 2 degrees of freedom."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t = r * np.sqrt((n - 2) / (1.0 - r ** 2))
+        return 2 * stats.t.sf(np.abs(t), n - 2)
+
+
+def _ranks(matrix: np.ndarray) -> np.ndarray:
+    return pd.DataFrame(matrix).rank(axis=0).to_numpy()
+
+
+def pairwise_spearman(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Spearman rho for every column of x against every column of y, shape (series, elements).
+
+    Each pair is ranked over the time steps where both are observed, like
+    scipy.stats.spearmanr with nan_policy='omit'. All series are ranked at once
+    under each element's mask, so the loop only runs over the elements.
+    """
+    x_observed = ~np.isnan(x)
+    rho = np.full((x.shape[1], y.shape[1]), np.nan)
+    for element in range(y.shape[1]):
+        both = x_observed & ~np.isnan(y[:, [element]])
+        x_ranks = _centered(_ranks(np.where(both, x, np.nan)))
+        y_ranks = _centered(_ranks(np.where(both, y[:, [element]], np.nan)))
+        x0, y0 = np.nan_to_num(x_ranks), np.nan_to_num(y_ranks)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rho[:, element] = (x0 * y0).sum(axis=0) / np.sqrt((x0 ** 2).sum(axis=0) * (y0 ** 2).sum(axis=0))
+        rho[both.sum(axis=0) < 3, element] = np.nan
+    return np.clip(rho, -1.0, 1.0)
+
+
+def lagged(matrix: np.ndarray, lag: int) -> np.ndarray:
+    """matrix shifted down by lag rows, so row t holds the value from t - lag."""
+    if lag == 0:
+        return matrix
+    shifted = np.full_like(matrix, np.nan)
+    if lag > 0:
+        shifted[lag:] = matrix[:-lag]
+    else:
+        shifted[:lag] = matrix[-lag:]
+    return shifted
+
+
+def _bootstrap_pearson(x: np.ndarray, y: np.ndarray, n_resamples: int, seed: int) -> np.ndarray:
+    """Pearson r for n_resamples resamplings of the time steps, shape (resamples, series, elements)."""
+    rng = np.random.default_rng(seed)
+    samples = rng.integers(0, len(x), size=(n_resamples, len(x)))
+    return np.stack([pairwise_pearson(x[rows], y[rows])[0] for rows in samples])
+
+
+def bootstrap_pearson_ci(
+    x: np.ndarray,
+    y: np.ndarray,
+    n_bootstrap: int,
+    confidence: float = 0.95,
+    seed: int = 0,
+    max_workers: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Percentile bootstrap interval for every Pearson r, resampling time steps in a process pool."""
+    max_workers = max_workers or os.cpu_count() or 1
+    batches = np.array_split(np.arange(n_bootstrap), max_workers)
+    seeds = np.random.SeedSequence(seed).generate_state(len(batches))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_bootstrap_pearson, x, y, len(batch), int(batch_seed))
+            for batch, batch_seed in zip(batches, seeds) if len(batch)
+        ]
+        replicates = np.concatenate([future.result() for future in futures])
+    alpha = (1.0 - confidence) / 2
+    with np.errstate(invalid='ignore'):
+        low, high = np.nanquantile(replicates, [alpha, 1.0 - alpha], axis=0)
+    return low, high
+
+
+def correlation_table(
+    consumption: pd.DataFrame,
+    weather: pd.DataFrame,
+    lags: Sequence[int] = (0,),
+    n_bootstrap: int = 0,
+    confidence: float = 0.95,
+    seed: int = 0,
+    max_workers: Optional[int] = None,
+) -> pd.DataFrame:
+    """Pearson and Spearman correlation of every consumption series with every weather element.
+
+    consumption has one column per series (e.g. kategori x bydel, see
+    monthly_consumption_matrix) and weather one column per element, both indexed
+    by period. A lag of k correlates consumption with the weather k periods
+    earlier. Spearman ranks each pair over the periods where both are observed
+    (see pairwise_spearman). With n_bootstrap > 0 a
+    percentile interval for Pearson r is added. Returns one row per series x
+    element x lag.
+    """
+    index = consumption.index.union(weather.index)
+    if isinstance(index, pd.PeriodIndex):
+        # Lags count periods, so missing months have to be present as NaN rows
+        index = pd.period_range(index.min(), index.max(), freq=index.freq)
+    x = consumption.reindex(index).to_numpy(dtype=float)
+    y_all = weather.reindex(index).to_numpy(dtype=float)
+
+    series = consumption.columns.to_frame(index=False)
+    if list(series.columns) == [0]:
+        series.columns = ['series']
+    tables = []
+    for lag in lags:
+        y = lagged(y_all, lag)
+        pearson_r, n = pairwise_pearson(x, y)
+        spearman_r = pairwise_spearman(x, y)
+        result = {
+            'n': n,
+            'pearson_r': pearson_r,
+            'pearson_p': correlation_p_values(pearson_r, n),
+            'spearman_r': spearman_r,
+            'spearman_p': correlation_p_values(spearman_r, n),
+        }
+        if n_bootstrap:
+            result['pearson_ci_low'], result['pearson_ci_high'] = bootstrap_pearson_ci(
+                x, y, n_bootstrap, confidence, seed, max_workers
+            )
+        table = series.loc[np.repeat(np.arange(len(series)), len(weather.columns))].reset_index(drop=True)
+        table['element'] = np.tile(np.asarray(weather.columns), len(series))
+        table['lag'] = lag
+        for name, values in result.items():
+            table[name] = np.ravel(values)
+        tables.append(table)
+    table = pd.concat(tables, ignore_index=True)
+    table['n'] = table['n'].astype(int)
+    return table
@@ -0,0 +1,159 @@
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+Coordinates = Tuple[Optional[float], Optional[float]]
+
+NOMINATIM_MIN_INTERVAL_SECONDS = 1.0
+
+
+def normalize_address(address: str) -> str:
+    """Normalize an address so that spelling variants share one cache entry."""
+    return re.sub(r"\s+", " ", str(address)).strip().lower()
+
+
+class GeocodingCache:
+    """Persistent SQLite key-value store of geocoded addresses, keyed by normalized address."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS geocodes (
+                address_key TEXT PRIMARY KEY,
+                address TEXT NOT NULL,
+                latitude REAL,
+                longitude REAL,
+                resolved_at TEXT NOT NULL
+            )
+            """
+        )
+        self.connection.commit()
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM geocodes").fetchone()[0]
+
+    def __contains__(self, address: str) -> bool:
+        row = self.connection.execute(
+            "SELECT 1 FROM geocodes WHERE address_key = ?", (normalize_address(address),)
+        ).fetchone()
+        return row is not None
+
+    def get_many(self, addresses: Iterable[str]) -> Dict[str, Coordinates]:
+        """Return cached coordinates for the addresses that have an entry; misses are left out."""
+        addresses = list(addresses)
+        key_list = list({normalize_address(a) for a in addresses})
+        found = {}
+        # SQLite limits the number of bound parameters per statement
+        for start in range(0, len(key_list), 500):
+            chunk = key_list[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.connection.execute(
+                f"SELECT address_key, latitude, longitude FROM geocodes WHERE address_key IN ({placeholders})",
+                chunk,
+            )
+            for key, lat, lon in rows:
+                found[key] = (lat, lon)
+        return {a: found[normalize_address(a)] for a in addresses if normalize_address(a) in found}
+
+    def put_many(self, results: Dict[str, Coordinates]) -> None:
+        """Store resolved addresses and commit, so each batch is checkpointed to disk."""
+        resolved_at = datetime.now(timezone.utc).isoformat()
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?)",
+            [
+                (normalize_address(address), address, lat, lon, resolved_at)
+                for address, (lat, lon) in results.items()
+            ],
+        )
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class RateLimiter:
+    """Thread-safe limiter allowing at most one call per min_interval seconds."""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.next_allowed = 0.0
+
+    def wait(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_allowed - now
+            self.next_allowed = max(now, self.next_allowed) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def nominatim_geocoder() -> Callable[[str], Coordinates]:
+    """Geocode "<address>, Oslo, Norway" with OSM Nominatim."""
+    from OSMPythonTools.nominatim import Nominatim
+
+    nominatim = Nominatim()
+
+    def geocode(address: str) -> Coordinates:
+        result = nominatim.query(f"{address}, Oslo, Norway").toJSON()
+        if result:
+            return float(result[0]['lat']), float(result[0]['lon'])
+        return None, None
+
+    return geocode
+
+
+def resolve_addresses(
+    addresses: Iterable[str],
+    cache: GeocodingCache,
+    geocode: Optional[Callable[[str], Coordinates]] = None,
+    batch_size: int = 50,
+    max_workers: int = 2,
+    min_interval: float = NOMINATIM_MIN_INTERVAL_SECONDS,
+) -> Dict[str, Coordinates]:
+    """Resolve coordinates for every address, only geocoding cache misses.
+
+    Misses are resolved in batches by a bounded thread pool sharing one rate limiter,
+    and each batch is written to the cache before the next starts. Addresses whose
+    lookup raised are left unresolved (None, None) and retried on the next run.
+    """
+    addresses = list(dict.fromkeys(addresses))
+    resolved = cache.get_many(addresses)
+    # One lookup per normalized address, even if it appears in several spellings
+    misses: List[str] = list({
+        normalize_address(a): a for a in reversed(addresses) if a not in resolved
+    }.values())[::-1]
+    if misses:
+        geocode = geocode or nominatim_geocoder()
+        limiter = RateLimiter(min_interval)
+
+        def limited_geocode(address: str) -> Optional[Coordinates]:
+            limiter.wait()
+            try:
+                return geocode(address)
+            except Exception as error:
+                print(f"Geocoding failed for {address!r}: {error}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for start in range(0, len(misses), batch_size):
+                batch = misses[start:start + batch_size]
+                batch_results = {
+                    address: coords
+                    for address, coords in zip(batch, executor.map(limited_geocode, batch))
+                    if coords is not None
+                }
+                cache.put_many(batch_results)
+                resolved.update(batch_results)
+                print(f"Geocoded {min(start + batch_size, len(misses))}/{len(misses)} new addresses")
+
+    resolved = {normalize_address(a): coords for a, coords in resolved.items()}
+    return {address: resolved.get(normalize_address(address), (None, None)) for address in addresses}
@@ -0,0 +1,75 @@
+import os
+from pathlib import Path
+from typing import Sequence
+import numpy as np
+import pandas as pd
+
+from utils.consumption_cube import CUBE_DIMENSIONS, CUBE_PATH, LOCATION_COLUMNS, build_consumption_cube, save_cube
+from utils.storage import DATA_PATH
+
+ROW_KEY = ['addresse', 'dato', 'kategori']
+# Row key hashes of every stage row aggregated into the cube (rows dropped by cleaning included)
+CUBE_KEYS_PATH = DATA_PATH / 'consumption_cube_keys.parquet'
+
+
+def row_key_hashes(df: pd.DataFrame, key: Sequence[str] = ROW_KEY) -> np.ndarray:
+    """64-bit content hash of the (addresse, dato, kategori) key of every row."""
+    normalized = pd.DataFrame({
+        # Fixed resolution, since the hash covers the raw int64 timestamps
+        column: pd.to_datetime(df[column]).astype('datetime64[ns]') if column == 'dato' else df[column].astype(str)
+        for column in key
+    })
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+
+
+def find_new_rows(release_df: pd.DataFrame, stored_df: pd.DataFrame, key: Sequence[str] = ROW_KEY) -> pd.DataFrame:
+    """Rows of a release whose key is not in the stored data yet (also deduplicated within the release)."""
+    release_hashes = row_key_hashes(release_df, key)
+    is_new = ~np.isin(release_hashes, row_key_hashes(stored_df, key)) if len(stored_df) else np.ones(len(release_df), dtype=bool)
+    is_new &= ~pd.Series(release_hashes).duplicated().to_numpy()
+    return release_df[is_new]
+
+
+def update_consumption_cube(cube: pd.DataFrame, new_rows: pd.DataFrame) -> pd.DataFrame:
+    """Merge the aggregates of newly appended (cleaned) rows into an existing cube.
+
+    Cells that already exist are combined (sum and count added, min/max folded),
+    new cells are appended. Outlier bounds for the new rows come from the delta
+    itself, so rebuild the cube from scratch now and then to re-clean the history.
+    """
+    delta = build_consumption_cube(new_rows)
+    if cube.empty:
+        return delta
+    combined = pd.concat([cube, delta], ignore_index=True)
+    for column in CUBE_DIMENSIONS:
+        if isinstance(cube[column].dtype, pd.CategoricalDtype) or isinstance(delta[column].dtype, pd.CategoricalDtype):
+            combined[column] = combined[column].astype('category')
+    aggregations = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'}
+    aggregations.update({c: 'first' for c in LOCATION_COLUMNS if c in combined.columns})
+    updated = combined.groupby(CUBE_DIMENSIONS, observed=True, dropna=False, sort=False).agg(aggregations)
+    updated['mean'] = updated['sum'] / updated['count']
+    return updated.reset_index()
+
+
+def load_cube_keys(path: Path = CUBE_KEYS_PATH) -> np.ndarray:
+    if not path.exists():
+        return np.empty(0, dtype=np.uint64)
+    return pd.read_parquet(path)['key_hash'].to_numpy()
+
+
+def save_cube_with_keys(
+    cube: pd.DataFrame,
+    key_hashes: np.ndarray,
+    cube_path: Path = CUBE_PATH,
+    keys_path: Path = CUBE_KEYS_PATH,
+) -> None:
+    """Save the cube together with the row keys it covers.
+
+    Both are written to temporary files first and then renamed into place, so a
+    crash while writing leaves the previous cube and keys untouched.
+    """
+    cube_tmp, keys_tmp = cube_path.with_suffix('.tmp'), keys_path.with_suffix('.tmp')
+    save_cube(cube, cube_tmp)
+    pd.DataFrame({'key_hash': np.unique(key_hashes)}).to_parquet(keys_tmp, index=False)
+    os.replace(keys_tmp, keys_path)
+    os.replace(cube_tmp, cube_path)
@@ -1,24 +1,161 @@
+from __future__ import annotations
+
+import hashlib
 from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional
 import pandas as pd
 import json
-import geopandas as gpd
-import topojson as tp
+
+# geopandas, shapely and topojson are imported where used, so CSV loading stays light
+if TYPE_CHECKING:
+    import geopandas as gpd
+
+STROMFORBRUK_DTYPES = {
+    'addresse': 'category',
+    'kategori': 'category',
+    'forbruk_kwh': 'float64',
+    'latitude': 'float64',
+    'longitude': 'float64',
+    'BYDELSNAVN': 'category',
+    'Kombinert': 'category',
+}
+STROMFORBRUK_DATE_COLUMNS = ['dato']
+
+# Metric CRS for Oslo (ETRS89 / UTM 33N), for distances and areas
+BYDEL_METRIC_CRS = 'EPSG:25833'
+
+# About 30 m in latitude; keeps the district shapes recognisable at city zoom levels
+DEFAULT_SIMPLIFY_TOLERANCE = 0.0003
 
 def read_csv_data(file_path: Path, sep: str = ',') -> pd.DataFrame:
     """Load CSV data into DataFrame."""
-    return pd.read_csv(file_path, engine='python', sep=sep)
+    return pd.read_csv(file_path, engine='c', sep=sep)
 
 
+def read_stromforbruk_csv(file_path: Path, sep: str = ';', engine: str = 'c') -> pd.DataFrame:
+    """Load a stromforbruk CSV with the declared schema, using the C or pyarrow parser."""
+    header = pd.read_csv(file_path, sep=sep, nrows=0).columns
+    return pd.read_csv(
+        file_path,
+        sep=sep,
+        decimal='.',
+        engine=engine,
+        dtype={c: t for c, t in STROMFORBRUK_DTYPES.items() if c in header},
+        parse_dates=[c for c in STROMFORBRUK_DATE_COLUMNS if c in header],
+    )
+
+
+def iter_stromforbruk_csv(file_path: Path, chunksize: int = 1_000_000, sep: str = ';') -> Iterator[pd.DataFrame]:
+    """Stream a stromforbruk CSV as typed chunks of at most chunksize rows.
+
+    Categorical columns only hold the categories seen in their own chunk, so combine
+    chunks with pd.concat (falls back to strings) or union_categoricals.
+    """
+    header = pd.read_csv(file_path, sep=sep, nrows=0).columns
+    reader = pd.read_csv(
+        file_path,
+        sep=sep,
+        decimal='.',
+        engine='c',
+        dtype={c: t for c, t in STROMFORBRUK_DTYPES.items() if c in header},
+        parse_dates=[c for c in STROMFORBRUK_DATE_COLUMNS if c in header],
+        chunksize=chunksize,
+    )
+    with reader:
+        yield from reader
+
+
+
+def load_bydeler_geodata(
+    path_to_data: Path,
+    simplify_tolerance: Optional[float] = None,
+    crs: Optional[str] = None,
+    use_cache: bool = True,
+) -> gpd.GeoDataFrame:
+    """Load bydeler topology data as GeoDataFrame, optionally simplified and/or reprojected.
+
+    The converted GeoDataFrame is cached as GeoParquet next to the source, keyed by
+    source content, tolerance and CRS, so the TopoJSON conversion only runs once.
+    The spatial index and prepared geometries are built before returning.
+    """
+    import shapely
+
+    path_to_data = Path(path_to_data)
+    variant = 'raw' if simplify_tolerance is None else f'simplified-{simplify_tolerance:g}'
+    crs_tag = (crs or 'EPSG:4326').replace(':', '')
+    cache_path = path_to_data.with_name(
+        f"{path_to_data.stem}.{variant}-{crs_tag}-{file_hash(path_to_data)}.parquet"
+    )
+
+    if use_cache and cache_path.exists():
+        gdf = _read_cached_bydeler(cache_path, crs or 'EPSG:4326')
+    else:
+        gdf = _convert_bydeler_topojson(path_to_data, simplify_tolerance)
+        if crs is not None:
+            gdf = gdf.to_crs(crs)
+        if use_cache:
+            gdf.to_parquet(cache_path)
+
+    shapely.prepare(gdf.geometry.values)
+    gdf.sindex
+    return gdf
+
+
+def _read_cached_bydeler(cache_path: Path, crs: str) -> gpd.GeoDataFrame:
+    import geopandas as gpd
+
+    # Decoding the WKB ourselves skips parsing the PROJJSON stored in the GeoParquet
+    # metadata, which costs more than reading the whole layer
+    df = pd.read_parquet(cache_path)
+    df['geometry'] = gpd.GeoSeries.from_wkb(df['geometry'], crs=crs)
+    return gpd.GeoDataFrame(df, geometry='geometry', crs=crs)
+
+
+def _convert_bydeler_topojson(path_to_data: Path, simplify_tolerance: Optional[float]) -> gpd.GeoDataFrame:
+    import topojson as tp
+
+    if simplify_tolerance is not None:
+        topo_data = load_simplified_bydeler_topojson(path_to_data, simplify_tolerance)
+    else:
+        with open(path_to_data, 'r', encoding='utf-8') as f:
+            topo_data = json.load(f)
 
-def load_bydeler_geodata(path_to_data: Path) -> gpd.GeoDataFrame:
-    """Load bydeler topology data as GeoDataFrame."""
-    with open(path_to_data, 'r', encoding='utf-8') as f:
-        topo_data = json.load(f)
-    
     topology = tp.Topology(topo_data, object_name='Bydeler')
     gdf = topology.to_gdf()
     gdf = gdf.set_crs('EPSG:4326', allow_override=True)
     return gdf
 
-def load_data(file_path):
-    return pd.read_csv(file_path, engine='python')   
\ No newline at end of file
+
+def file_hash(path: Path) -> str:
+    """Short content hash of a file, used to key derived caches."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def load_simplified_bydeler_topojson(path_to_data: Path, tolerance: float = DEFAULT_SIMPLIFY_TOLERANCE) -> dict:
+    """Bydeler TopoJSON simplified on shared arcs, so adjacent districts keep common borders.
+
+    The result is cached next to the source file, keyed by tolerance and source content.
+    """
+    import topojson as tp
+
+    path_to_data = Path(path_to_data)
+    cache_path = path_to_data.with_name(
+        f"{path_to_data.stem}.simplified-{tolerance:g}-{file_hash(path_to_data)}.json"
+    )
+    if cache_path.exists():
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    with open(path_to_data, 'r', encoding='utf-8') as f:
+        topo_data = json.load(f)
+    simplified = tp.Topology(topo_data, object_name='Bydeler').toposimplify(tolerance).to_dict()
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump(simplified, f)
+    return simplified
+
+def load_data(file_path: Path, chunksize: Optional[int] = None):
+    return pd.read_csv(file_path, engine='c', chunksize=chunksize)
@@ -0,0 +1,63 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+import numpy as np
+import pandas as pd
+
+# Reference data shared by every task in a worker, set once by the pool initializer
+_reference: Any = None
+
+
+def _set_reference(reference: Any) -> None:
+    global _reference
+    _reference = reference
+
+
+def _apply_to_chunk(func: Callable[[pd.DataFrame, Any], pd.DataFrame], chunk: pd.DataFrame) -> pd.DataFrame:
+    return func(chunk, _reference)
+
+
+def partition_ids(df: pd.DataFrame, partition_by: str, n_partitions: int) -> np.ndarray:
+    """Partition number per row: by calendar year, or by hash of a column such as addresse."""
+    if partition_by == 'year':
+        years = df['year'] if 'year' in df.columns else pd.to_datetime(df['dato']).dt.year
+        return pd.factorize(years)[0]
+    hashes = pd.util.hash_pandas_object(df[partition_by], index=False).to_numpy()
+    return (hashes % np.uint64(n_partitions)).astype(np.int64)
+
+
+def map_partitions(
+    df: pd.DataFrame,
+    func: Callable[[pd.DataFrame, Any], pd.DataFrame],
+    reference: Any,
+    partition_by: str = 'addresse',
+    n_partitions: Optional[int] = None,
+    max_workers: Optional[int] = None,
+) -> pd.DataFrame:
+    """Run func(chunk, reference) over partitions of df in a process pool.
+
+    func must be a module-level function returning one row per input row. The
+    reference data (e.g. bydel geometries or the geo lookup) is sent to each
+    worker once rather than with every chunk. Rows come back in the order and
+    with the index of df. With a single worker func runs in this process.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(df) == 0:
+        result = func(df, reference)
+        result.index = df.index
+        return result
+
+    n_partitions = n_partitions or 4 * max_workers
+    ids = partition_ids(df, partition_by, n_partitions)
+    order = np.argsort(ids, kind='stable')
+    boundaries = np.flatnonzero(np.diff(ids[order])) + 1
+    chunks = [df.iloc[rows] for rows in np.split(order, boundaries)]
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_set_reference, initargs=(reference,)) as executor:
+        results = list(executor.map(_apply_to_chunk, [func] * len(chunks), chunks))
+
+    result = pd.concat(results, ignore_index=True)
+    # Undo the grouping: row i of the concatenation is row order[i] of df
+    result = result.iloc[np.argsort(order, kind='stable')]
+    result.index = df.index
+    return result
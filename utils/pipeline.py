@@ -0,0 +1,227 @@
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+import pandas as pd
+
+from utils.anomalies import ANOMALY_PATH
+from utils.consumption_cube import CUBE_PATH
+from utils.incremental import CUBE_KEYS_PATH
+from utils.loading_funcs import file_hash
+from utils.storage import DATA_PATH, FIGURE_DIR, STAGE_PATHS
+
+ROOT_PATH = Path(__file__).parent.parent
+STATE_PATH = DATA_PATH / '.pipeline_state.json'
+BYDELER_PATH = DATA_PATH / 'Bydeler_Oslo_m_marka.json'
+ADDRESS_GEO_PATH = DATA_PATH / 'address_geo_locations.json'
+STATION_ALLOCATION_PATH = DATA_PATH / 'address_closest_weather_stations.json'
+
+
+@dataclass
+class Stage:
+    """A pipeline script whose main() turns its input files into its output files."""
+    name: str
+    module: str
+    inputs: List[Path]
+    outputs: List[Path] = field(default_factory=list)
+
+
+@dataclass
+class StageReport:
+    name: str
+    status: str
+    seconds: float
+    max_rss_mb: float
+
+
+PIPELINE_STAGES = [
+    Stage('geocode', 'allocate_location_to_el_data', [DATA_PATH / 'stromforbruk.csv'],
+          [ADDRESS_GEO_PATH, STAGE_PATHS['geo']]),
+    Stage('allocate', 'allocate_bydel_to_data', [STAGE_PATHS['geo'], BYDELER_PATH], [STAGE_PATHS['bydel']]),
+    Stage('stations', 'allocate_clostest_weather_station', [ADDRESS_GEO_PATH], [STATION_ALLOCATION_PATH]),
+    Stage('cube', 'build_consumption_cube', [STAGE_PATHS['bydel']], [CUBE_PATH, CUBE_KEYS_PATH]),
+    Stage('anomalies', 'detect_consumption_anomalies', [CUBE_PATH], [ANOMALY_PATH]),
+    Stage('analyse', 'analyse_electricity_city', [CUBE_PATH, BYDELER_PATH], [FIGURE_DIR / 'average_map.html']),
+    Stage('analyse-weather', 'analyse_electricity_weather', [CUBE_PATH, STATION_ALLOCATION_PATH],
+          [FIGURE_DIR / 'korrelasjon_kategori_bydel_vaer.csv']),
+    Stage('map', 'map_measurments', [CUBE_PATH, BYDELER_PATH],
+          [ROOT_PATH / 'map_visualisations' / 'oslo_electricity_map.html']),
+]
+
+
+def path_hash(path: Path) -> str:
+    """Content hash of a file, or of every file below a directory (partitioned stages)."""
+    if not path.exists():
+        return 'missing'
+    if path.is_file():
+        return file_hash(path)
+    digest = hashlib.sha256()
+    for child in sorted(p for p in path.rglob('*') if p.is_file()):
+        digest.update(f"{child.relative_to(path)}:{file_hash(child)}".encode())
+    return digest.hexdigest()[:16]
+
+
+def local_source_files(module: str) -> List[Path]:
+    """Source file of a module plus every repo module it imports, transitively."""
+    seen: Set[Path] = set()
+    pending = [module]
+    while pending:
+        source = ROOT_PATH / (pending.pop().replace('.', '/') + '.py')
+        if source in seen or not source.exists():
+            continue
+        seen.add(source)
+        for node in ast.walk(ast.parse(source.read_text(encoding='utf-8'))):
+            if isinstance(node, ast.Import):
+                pending.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                pending.append(node.module)
+    return sorted(seen)
+
+
+def stage_fingerprint(stage: Stage) -> Dict[str, str]:
+    """Hashes that decide whether a stage is stale: its inputs and the code it runs."""
+    code = hashlib.sha256()
+    for source in local_source_files(stage.module):
+        code.update(f"{source.relative_to(ROOT_PATH)}:{file_hash(source)}".encode())
+    return {
+        'code': code.hexdigest()[:16],
+        **{str(p.relative_to(ROOT_PATH)): path_hash(p) for p in stage.inputs},
+    }
+
+
+def is_up_to_date(stage: Stage, fingerprint: Dict[str, str], state: dict) -> bool:
+    return state.get(stage.name) == fingerprint and all(p.exists() for p in stage.outputs)
+
+
+# The stage copies its own /proc status on exit: VmHWM is the peak RSS of the new process
+# image, while ru_maxrss would also count what this runner held before the exec. Without
+# /proc (e.g. macOS) ru_maxrss is the fallback, and a failing measurement never fails the stage.
+STAGE_COMMAND = """
+import {module}
+{module}.main()
+try:
+    status = open('/proc/self/status').read()
+except OSError:
+    try:
+        import resource, sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        status = f"VmHWM: {{peak // 1024 if sys.platform == 'darwin' else peak}} kB"
+    except Exception:
+        status = ''
+try:
+    open({status_path!r}, 'w').write(status)
+except OSError:
+    pass
+"""
+
+
+def peak_rss_mb(status_path: Path) -> float:
+    """VmHWM from the stage's copied status file, NaN where no measurement is available."""
+    if not status_path.exists():
+        return float('nan')
+    for line in status_path.read_text().splitlines():
+        if line.startswith('VmHWM:'):
+            return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+def run_stage(stage: Stage) -> StageReport:
+    """Run a stage's main() in its own interpreter and measure wall time and peak memory."""
+    with tempfile.TemporaryDirectory() as tmp:
+        status_path = Path(tmp) / 'status'
+        start = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, '-c', STAGE_COMMAND.format(module=stage.module, status_path=str(status_path))],
+            cwd=ROOT_PATH,
+            env={**os.environ, 'MPLBACKEND': 'Agg'},
+        )
+        seconds = time.perf_counter() - start
+        status = 'ran' if process.returncode == 0 else 'failed'
+        return StageReport(stage.name, status, seconds, peak_rss_mb(status_path))
+
+
+def upstream_stages(stages: List[Stage]) -> Dict[str, Set[str]]:
+    """Stages each stage depends on, found by matching its inputs to other stages' outputs."""
+    producers = {output: stage.name for stage in stages for output in stage.outputs}
+    return {stage.name: {producers[p] for p in stage.inputs if p in producers} for stage in stages}
+
+
+def select_stages(stages: List[Stage], targets: Optional[Iterable[str]]) -> List[Stage]:
+    """The target stages and everything upstream of them, in declaration order."""
+    if not targets:
+        return list(stages)
+    upstream = upstream_stages(stages)
+    unknown = set(targets) - set(upstream)
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}")
+    selected: Set[str] = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(upstream[name])
+    return [stage for stage in stages if stage.name in selected]
+
+
+def run_pipeline(
+    stages: List[Stage] = PIPELINE_STAGES,
+    targets: Optional[Iterable[str]] = None,
+    force: bool = False,
+    max_workers: int = 2,
+    state_path: Path = STATE_PATH,
+) -> pd.DataFrame:
+    """Run the stale stages needed for targets, independent stages in parallel.
+
+    A stage is skipped when the hashes of its inputs and code match its last
+    successful run and its outputs exist. Stages downstream of a failure are
+    not run. Returns one row per stage with status, wall time and peak RSS.
+    """
+    stages = select_stages(stages, targets)
+    upstream = upstream_stages(stages)
+    state = json.loads(state_path.read_text()) if state_path.exists() else {}
+    reports: Dict[str, StageReport] = {}
+    fingerprints: Dict[str, Dict[str, str]] = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while len(reports) < len(stages):
+            for stage in stages:
+                if stage.name in reports or stage.name in running.values():
+                    continue
+                upstream_status = [reports[u].status if u in reports else None for u in upstream[stage.name]]
+                if any(status in ('failed', 'blocked') for status in upstream_status):
+                    reports[stage.name] = StageReport(stage.name, 'blocked', 0.0, float('nan'))
+                    continue
+                if None in upstream_status:
+                    continue
+                fingerprint = stage_fingerprint(stage)
+                if not force and is_up_to_date(stage, fingerprint, state):
+                    reports[stage.name] = StageReport(stage.name, 'skipped', 0.0, float('nan'))
+                    continue
+                fingerprints[stage.name] = fingerprint
+                running[executor.submit(run_stage, stage)] = stage.name
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                report = future.result()
+                reports[name] = report
+                print(f"{name}: {report.status} in {report.seconds:.1f} s, peak {report.max_rss_mb:.0f} MB")
+                if report.status == 'ran':
+                    state[name] = fingerprints[name]
+                    state_path.parent.mkdir(parents=True, exist_ok=True)
+                    state_path.write_text(json.dumps(state, indent=2))
+
+    return pd.DataFrame([vars(reports[stage.name]) for stage in stages])
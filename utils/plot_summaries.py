@@ -0,0 +1,80 @@
+from typing import Dict, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+from utils.transformations import grouped_quantiles, resolve_group_keys
+
+HISTOGRAM_RANGE = (0.0, 15000.0)
+HISTOGRAM_BINS = {'Belysning': 50}
+DEFAULT_HISTOGRAM_BINS = 100
+
+
+def histogram_summary(
+    dataframe: pd.DataFrame,
+    kategorier: Sequence[str],
+    value_range: Tuple[float, float] = HISTOGRAM_RANGE,
+    bins: Dict[str, int] = HISTOGRAM_BINS,
+    column: str = 'forbruk_kwh',
+) -> pd.DataFrame:
+    """Fixed-edge histogram counts per kategori, one row per bin, from a single bincount pass.
+
+    Each kategori gets bins.get(kategori, DEFAULT_HISTOGRAM_BINS) equal-width bins
+    over value_range; values outside it are not counted.
+    """
+    low, high = value_range
+    n_bins = np.array([bins.get(k, DEFAULT_HISTOGRAM_BINS) for k in kategorier])
+    offsets = np.concatenate([[0], np.cumsum(n_bins)])
+
+    codes = pd.Categorical(dataframe['kategori'], categories=list(kategorier)).codes
+    values = dataframe[column].to_numpy(dtype=float)
+    keep = (codes >= 0) & (values >= low) & (values <= high)
+    codes, values = codes[keep], values[keep]
+    row_bins = n_bins[codes]
+    # The top edge belongs to the last bin, as in np.histogram
+    bin_index = np.minimum(((values - low) / (high - low) * row_bins).astype(np.int64), row_bins - 1)
+    counts = np.bincount(offsets[codes] + bin_index, minlength=offsets[-1])
+
+    edges = [np.linspace(low, high, n + 1) for n in n_bins]
+    return pd.DataFrame({
+        'kategori': np.repeat(list(kategorier), n_bins),
+        'bin_left': np.concatenate([e[:-1] for e in edges]),
+        'bin_right': np.concatenate([e[1:] for e in edges]),
+        'count': counts,
+    })
+
+
+def boxplot_summary(dataframe: pd.DataFrame, column: str = 'forbruk_kwh', whisker: float = 1.5) -> pd.DataFrame:
+    """Five-number summary per kategori x month, with whiskers as matplotlib draws them.
+
+    Whiskers reach the most extreme value within whisker * IQR of the box. Month
+    comes from a month column or is parsed once from dato.
+    """
+    kategori, month = resolve_group_keys(dataframe, ['kategori', 'month'])
+    kategori_codes, kategorier = pd.factorize(kategori, sort=True)
+    month_values = month.to_numpy()
+    values = dataframe[column].to_numpy(dtype=float)
+    valid = (kategori_codes >= 0) & ~np.isnan(values) & ~pd.isna(month_values)
+    codes = np.where(valid, kategori_codes * 12 + np.where(valid, month_values, 1).astype(np.int64) - 1, -1)
+
+    q1, med, q3 = grouped_quantiles(values, codes, [0.25, 0.5, 0.75]).T
+    n_groups = len(q1)
+    iqr = q3 - q1
+    grouped = pd.Series(values[valid]).groupby(codes[valid])
+    in_fence = pd.Series(values[valid]).where(
+        (values[valid] >= (q1 - whisker * iqr)[codes[valid]]) & (values[valid] <= (q3 + whisker * iqr)[codes[valid]])
+    ).groupby(codes[valid])
+
+    summary = pd.DataFrame({
+        'kategori': np.repeat(np.asarray(kategorier), 12)[:n_groups],
+        'month': np.tile(np.arange(1, 13), len(kategorier))[:n_groups],
+        'q1': q1,
+        'med': med,
+        'q3': q3,
+    })
+    summary['count'] = grouped.size().reindex(summary.index, fill_value=0).to_numpy()
+    summary['mean'] = grouped.mean().reindex(summary.index).to_numpy()
+    summary['min'] = grouped.min().reindex(summary.index).to_numpy()
+    summary['max'] = grouped.max().reindex(summary.index).to_numpy()
+    summary['whislo'] = in_fence.min().reindex(summary.index).to_numpy()
+    summary['whishi'] = in_fence.max().reindex(summary.index).to_numpy()
+    return summary[summary['count'] > 0].reset_index(drop=True)
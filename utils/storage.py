@@ -0,0 +1,140 @@
+import os
+import uuid
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DATA_PATH = Path(__file__).parent.parent / 'data'
+# Figures, maps and tables written by the analyses
+FIGURE_DIR = Path(os.getenv('FIGURE_DIR', Path(__file__).parent.parent / 'figures'))
+
+STAGE_PATHS = {
+    'geo': DATA_PATH / 'stromforbruk_with_geo.parquet',
+    'bydel': DATA_PATH / 'stromforbruk_with_bydel.parquet',
+}
+
+PARTITION_COLUMNS = ['year', 'kategori']
+
+CATEGORICAL_COLUMNS = ['kategori', 'addresse', 'BYDELSNAVN', 'Kombinert']
+# Fixed dictionary index width, so files written with few or many categories always unify
+DICTIONARY_INDEX_TYPE = pa.int32()
+FLOAT32_COLUMNS = ['latitude', 'longitude']
+
+ROWS_PER_GROUP = 1_000_000
+
+Filter = Tuple[str, str, object]
+
+
+def apply_stage_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast the stromforbruk columns to their stored dtypes."""
+    df = df.copy()
+    if 'dato' in df.columns:
+        df['dato'] = pd.to_datetime(df['dato'])
+        df['year'] = df['dato'].dt.year.astype('int16')
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    for column in FLOAT32_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('float32')
+    if 'forbruk_kwh' in df.columns:
+        df['forbruk_kwh'] = pd.to_numeric(df['forbruk_kwh'], errors='coerce')
+    return df
+
+
+def _wide_dictionary_field(field: pa.Field) -> pa.Field:
+    """field with a DICTIONARY_INDEX_TYPE index if it is dictionary encoded; only the value type is kept."""
+    if not pa.types.is_dictionary(field.type):
+        return field
+    return field.with_type(pa.dictionary(DICTIONARY_INDEX_TYPE, field.type.value_type))
+
+
+def stage_schema(path: Path, partition_cols: Sequence[str] = PARTITION_COLUMNS) -> pa.Schema:
+    """Schema of a stored stage with DICTIONARY_INDEX_TYPE dictionaries.
+
+    Stages written before the index width was fixed may mix int8 and int32 indices
+    across files; reading with this schema unifies them. Partition keys get their
+    plain value type, since an explicit schema cannot carry hive dictionaries.
+    """
+    stored_schema = pq.ParquetDataset(path).schema
+    return pa.schema([
+        field.with_type(field.type.value_type) if field.name in partition_cols and pa.types.is_dictionary(field.type)
+        else _wide_dictionary_field(field)
+        for field in stored_schema
+    ], metadata=stored_schema.metadata)
+
+
+def write_stage(
+    df: pd.DataFrame,
+    path: Path,
+    partition_cols: Sequence[str] = PARTITION_COLUMNS,
+    append: bool = False,
+) -> None:
+    """Write a pipeline stage as a Parquet dataset partitioned by year and kategori.
+
+    By default the partitions present in df are replaced. With append, df is added
+    as new files next to the existing ones, cast to the stored schema. Categoricals
+    are stored with an int32 dictionary index whatever their number of categories.
+    """
+    df = apply_stage_schema(df).sort_values(list(partition_cols), kind='stable')
+    table = pa.Table.from_pandas(df, preserve_index=False).combine_chunks()
+    schema = pa.schema([_wide_dictionary_field(field) for field in table.schema], metadata=table.schema.metadata)
+    if append and Path(path).exists():
+        stored_schema = stage_schema(path, partition_cols)
+        schema = pa.schema([
+            field if field.name in partition_cols else stored_schema.field(field.name)
+            for field in schema
+        ], metadata=schema.metadata)
+    table = table.cast(schema)
+    pq.write_to_dataset(
+        table,
+        root_path=str(path),
+        partition_cols=list(partition_cols),
+        existing_data_behavior='overwrite_or_ignore' if append else 'delete_matching',
+        basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet',
+        min_rows_per_group=ROWS_PER_GROUP,
+        max_rows_per_group=ROWS_PER_GROUP,
+    )
+
+
+def read_stage(
+    path: Path,
+    columns: Optional[List[str]] = None,
+    filters: Optional[List[Filter]] = None,
+) -> pd.DataFrame:
+    """Read a pipeline stage, loading only the requested columns and matching partitions.
+
+    Example: read_stage(path, columns=['dato', 'forbruk_kwh'],
+                        filters=[('kategori', '==', 'Belysning'), ('year', '==', 2020)])
+    """
+    df = pd.read_parquet(path, columns=columns, filters=filters, schema=stage_schema(path))
+    if 'year' in df.columns:
+        df['year'] = df['year'].astype('int16')
+    if 'kategori' in df.columns:
+        df['kategori'] = df['kategori'].astype('category')
+    return df
+
+
+def stage_filters(
+    year: Union[int, Sequence[int], None] = None,
+    kategori: Union[str, Sequence[str], None] = None,
+) -> Optional[List[Filter]]:
+    """Build partition filters for read_stage from a year and/or kategori selection."""
+    filters = []
+    for column, value in (('year', year), ('kategori', kategori)):
+        if value is None:
+            continue
+        if isinstance(value, (str, int)):
+            filters.append((column, '==', value))
+        else:
+            filters.append((column, 'in', list(value)))
+    return filters or None
+
+
+def output_file(path: Union[str, Path]) -> Path:
+    """Path of an analysis output; relative paths go under FIGURE_DIR. Creates the parent directory."""
+    path = FIGURE_DIR / path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
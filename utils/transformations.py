@@ -1,8 +1,29 @@
+import inspect
+import time
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable, List, Optional, Sequence
 import pandas as pd
 import numpy as np
 
-def remove_negative_values(dataframe: pd.DataFrame):
-    dataframe.loc[dataframe['forbruk_kwh'] < 0, 'forbruk_kwh'] = np.nan
+def remove_negative_values(dataframe: pd.DataFrame, inplace: bool = False):
+    """Set negative forbruk_kwh to NaN. Without inplace, only the forbruk_kwh column is copied."""
+    if inplace:
+        dataframe.loc[dataframe['forbruk_kwh'] < 0, 'forbruk_kwh'] = np.nan
+        return dataframe
+    dataframe = dataframe.copy(deep=False)
+    dataframe['forbruk_kwh'] = dataframe['forbruk_kwh'].mask(dataframe['forbruk_kwh'] < 0)
+    return dataframe
+
+def add_date_columns(dataframe: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
+    """Parse dato once and add year, month and year_month columns."""
+    if not inplace:
+        dataframe = dataframe.copy(deep=False)
+    dato = pd.to_datetime(dataframe['dato'])
+    dataframe['dato'] = dato
+    dataframe['year'] = dato.dt.year
+    dataframe['month'] = dato.dt.month
+    dataframe['year_month'] = dato.dt.to_period('M')
     return dataframe
 
 def remove_outliers_iqr(dataframe: pd.DataFrame, column_name: str):
@@ -14,10 +35,147 @@ def remove_outliers_iqr(dataframe: pd.DataFrame, column_name: str):
     filtered_df = dataframe[(dataframe[column_name] >= lower_bound) & (dataframe[column_name] <= upper_bound)]
     return filtered_df
 
-def clean_data_from_outliers(dataframe: pd.DataFrame):
-    categoies = dataframe['kategori'].unique()
-    cleaned_df = pd.DataFrame()
-    for column_name in categoies:
-        category_df = dataframe[dataframe['kategori'] == column_name]
-        cleaned_df = pd.concat([cleaned_df, remove_outliers_iqr(category_df, "forbruk_kwh")])
-    return cleaned_df
\ No newline at end of file
+def resolve_group_keys(dataframe: pd.DataFrame, group_by: Sequence[str]) -> List[pd.Series]:
+    """Look up grouping columns, deriving 'year' and 'month' from dato when they are not columns."""
+    keys = []
+    dato = None
+    for key in group_by:
+        if key in dataframe.columns:
+            keys.append(dataframe[key])
+        elif key in ('year', 'month'):
+            if dato is None:
+                dato = pd.to_datetime(dataframe['dato'])
+            keys.append(getattr(dato.dt, key).rename(key))
+        else:
+            raise KeyError(f"Unknown grouping key: {key}")
+    return keys
+
+def _group_codes(keys: List[pd.Series]) -> np.ndarray:
+    """Integer group id per row for the combination of keys; -1 where any key is missing."""
+    combined = np.zeros(len(keys[0]), dtype=np.int64)
+    missing = np.zeros(len(keys[0]), dtype=bool)
+    for key in keys:
+        codes, uniques = pd.factorize(key)
+        missing |= codes < 0
+        combined = combined * max(len(uniques), 1) + codes
+    if len(keys) > 1:
+        combined, _ = pd.factorize(combined)
+    combined[missing] = -1
+    return combined
+
+def grouped_quantiles(values: np.ndarray, codes: np.ndarray, quantiles: Sequence[float]) -> np.ndarray:
+    """Quantiles per group id, as an (n_groups, len(quantiles)) array; NaN values are ignored.
+
+    Rows are bucketed by one stable sort on the group id, then each bucket uses
+    np.quantile's linear-time selection instead of a full sort of the values.
+    """
+    n_groups = codes.max() + 1 if len(codes) else 0
+    result = np.full((n_groups, len(quantiles)), np.nan)
+    if n_groups == 0:
+        return result
+    # int16 keys let numpy use radix sort
+    order = np.argsort(codes.astype(np.int16 if n_groups < 2 ** 15 else np.int64), kind='stable')
+    sorted_values = values[order]
+    boundaries = (codes < 0).sum() + np.concatenate([[0], np.cumsum(np.bincount(codes[codes >= 0], minlength=n_groups))])
+    for group in range(n_groups):
+        group_values = sorted_values[boundaries[group]:boundaries[group + 1]]
+        group_values = group_values[~np.isnan(group_values)]
+        if len(group_values):
+            result[group] = np.quantile(group_values, quantiles)
+    return result
+
+def clean_data_from_outliers(
+    dataframe: pd.DataFrame,
+    group_by: Sequence[str] = ('kategori',),
+    keep_nan: bool = False,
+    column_name: str = 'forbruk_kwh',
+    lower_quantile: float = 0.01,
+    upper_quantile: float = 0.99,
+) -> pd.DataFrame:
+    """Drop rows outside the IQR-style bounds of their group, keeping the original row order.
+
+    group_by can combine kategori with any column (e.g. BYDELSNAVN) or 'month'/'year'
+    derived from dato. With keep_nan, rows whose value is NaN (e.g. negatives removed by
+    remove_negative_values) are kept instead of dropped.
+    """
+    codes = _group_codes(resolve_group_keys(dataframe, group_by))
+    values = dataframe[column_name].to_numpy(dtype=float)
+    bounds = grouped_quantiles(values, codes, [lower_quantile, upper_quantile])
+    # Code -1 (missing group key) picks the trailing NaN row, so those rows get no bounds
+    q1, q3 = np.vstack([bounds, [np.nan, np.nan]])[codes].T
+    iqr = q3 - q1
+    mask = (values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)
+    if keep_nan:
+        mask |= np.isnan(values)
+    return dataframe[mask]
+
+
+@dataclass
+class StepReport:
+    name: str
+    seconds: float
+    rows_in: int
+    rows_out: int
+    memory_in_mb: float
+    memory_out_mb: float
+
+
+def _memory_mb(dataframe: pd.DataFrame) -> float:
+    return dataframe.memory_usage(index=True, deep=False).sum() / 1024 ** 2
+
+
+class TransformationPipeline:
+    """Chain of DataFrame -> DataFrame steps declared once and run in order.
+
+    With inplace=False every step runs in its non-mutating mode, which the steps in
+    this module implement with shallow copies, so only replaced columns are copied
+    and the caller's frame is left untouched. With inplace=True, steps that take an
+    inplace argument modify the frame they get instead.
+    """
+
+    def __init__(self, steps: Optional[Sequence[Callable[[pd.DataFrame], pd.DataFrame]]] = None, inplace: bool = False):
+        self.steps: List[Callable[[pd.DataFrame], pd.DataFrame]] = list(steps or [])
+        self.inplace = inplace
+        self.reports: List[StepReport] = []
+
+    def add_step(self, step: Callable[..., pd.DataFrame], **kwargs) -> "TransformationPipeline":
+        self.steps.append(partial(step, **kwargs) if kwargs else step)
+        return self
+
+    def run(self, dataframe: pd.DataFrame) -> pd.DataFrame:
+        self.reports = []
+        for step in self.steps:
+            rows_in, memory_in = len(dataframe), _memory_mb(dataframe)
+            start = time.perf_counter()
+            dataframe = step(dataframe, inplace=True) if self.inplace and _accepts_inplace(step) else step(dataframe)
+            self.reports.append(StepReport(
+                name=_step_name(step),
+                seconds=time.perf_counter() - start,
+                rows_in=rows_in,
+                rows_out=len(dataframe),
+                memory_in_mb=memory_in,
+                memory_out_mb=_memory_mb(dataframe),
+            ))
+        return dataframe
+
+    def report(self) -> pd.DataFrame:
+        """Time, row count and frame size per step of the last run."""
+        return pd.DataFrame([vars(r) for r in self.reports])
+
+
+def _step_name(step: Callable) -> str:
+    return getattr(getattr(step, 'func', step), '__name__', repr(step))
+
+
+def _accepts_inplace(step: Callable) -> bool:
+    return 'inplace' in inspect.signature(step).parameters
+
+
+def electricity_cleaning_pipeline(inplace: bool = False) -> TransformationPipeline:
+    """Shared cleaning for the analyses: negatives to NaN, per-kategori outliers, date columns."""
+    return (
+        TransformationPipeline(inplace=inplace)
+        .add_step(remove_negative_values)
+        .add_step(clean_data_from_outliers)
+        .add_step(add_date_columns)
+    )
@@ -1,21 +1,74 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, List, Optional, Sequence, Tuple, Union
+import matplotlib
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
-import geopandas as gpd
-import folium
-from branca.colormap import LinearColormap
 
+from utils.plot_summaries import boxplot_summary, histogram_summary
+from utils.storage import FIGURE_DIR, output_file
+
+# folium and geopandas are only needed for the maps, so they are imported there
+if TYPE_CHECKING:
+    import geopandas as gpd
+
+FIGURE_DPI = 300
+
+PathLike = Union[str, Path]
+FigureJob = Tuple[Callable, tuple, PathLike]
+
+
+def use_headless_backend() -> None:
+    """Switch matplotlib to Agg so batch runs never open windows or block on show()."""
+    matplotlib.use('Agg', force=True)
+
+
+def finish_figure(fig: plt.Figure, output_path: Optional[PathLike] = None, dpi: int = FIGURE_DPI) -> plt.Figure:
+    """Save fig to output_path (relative paths go under FIGURE_DIR) and close it.
+
+    Without an output_path the figure is returned open; close it with plt.close(fig).
+    """
+    fig.tight_layout()
+    if output_path is not None:
+        fig.savefig(output_file(output_path), dpi=dpi, bbox_inches='tight')
+        plt.close(fig)
+    return fig
+
+
+def _render_figure(plot_func: Callable, args: tuple, output_path: PathLike) -> Path:
+    plot_func(*args, output_path=output_path)
+    plt.close('all')
+    return FIGURE_DIR / output_path
+
+
+def render_figures(jobs: Sequence[FigureJob], max_workers: Optional[int] = None) -> List[Path]:
+    """Render (plot_func, args, output_path) jobs concurrently in a process pool with the Agg backend.
 
-def plot_forbruk_by_bydel_over_time(aggregated_df: pd.DataFrame):
+    plot_func must be a module-level function taking output_path as keyword.
+    Returns the written paths in job order.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=use_headless_backend) as executor:
+        futures = [executor.submit(_render_figure, func, args, path) for func, args, path in jobs]
+        return [future.result() for future in futures]
+
+
+def plot_forbruk_by_bydel_over_time(
+    aggregated_df: pd.DataFrame,
+    kategori: str = "belysning",
+    output_path: Optional[PathLike] = None,
+) -> plt.Figure:
     bydeler = sorted(aggregated_df["Bydel"].unique())
     colors = plt.cm.tab20(np.linspace(0, 1, len(bydeler)))
     # alternatives: tab20b, tab20c, viridis, plasma
 
-    plt.figure(figsize=(16, 9))
+    fig, ax = plt.subplots(figsize=(16, 9))
 
     for color, bydel in zip(colors, bydeler):
         grp = aggregated_df[aggregated_df["Bydel"] == bydel].sort_values("year")
-        plt.plot(
+        ax.plot(
             grp["year"],
             grp["forbruk_kwh"],
             label=bydel,
@@ -24,12 +77,12 @@ def plot_forbruk_by_bydel_over_time(aggregated_df: pd.DataFrame):
             alpha=0.9
         )
 
-    plt.title("Strømforbruk til belysning per bydel (2014–2022)", fontsize=16)
-    plt.xlabel("År")
-    plt.ylabel("Strømforbruk (kWh)")
-    plt.grid(True, linestyle="--", linewidth=0.5, alpha=0.6)
+    ax.set_title(f"Strømforbruk til {kategori.lower()} per bydel (2014–2022)", fontsize=16)
+    ax.set_xlabel("År")
+    ax.set_ylabel("Strømforbruk (kWh)")
+    ax.grid(True, linestyle="--", linewidth=0.5, alpha=0.6)
 
-    plt.legend(
+    ax.legend(
         title="Bydel",
         bbox_to_anchor=(1.02, 1),
         loc="upper left",
@@ -37,16 +90,48 @@ def plot_forbruk_by_bydel_over_time(aggregated_df: pd.DataFrame):
         fontsize=10
     )
 
-    plt.tight_layout()
-    plt.show()
+    return finish_figure(fig, output_path)
+
+
+def attach_properties_to_topojson(
+    topo_data: dict,
+    df: pd.DataFrame,
+    left_on: str,
+    right_on: str,
+    object_name: str = "Bydeler",
+) -> dict:
+    """Copy of a TopoJSON whose geometries carry the matching df row as extra properties.
+
+    The arcs are shared with the input, only the object properties are new.
+    Geometries without a matching row get every df column as None, like a left
+    merge, so tooltips can rely on the fields being present.
+    """
+    rows = df.set_index(right_on).astype(object).where(df.set_index(right_on).notna(), None)
+    unmatched = dict.fromkeys(rows.columns)
+    rows = rows.to_dict(orient="index")
+    geometries = []
+    for geometry in topo_data["objects"][object_name]["geometries"]:
+        properties = dict(geometry.get("properties", {}))
+        properties.update(rows.get(properties.get(left_on), unmatched))
+        geometries.append({**geometry, "properties": properties})
+    objects = {**topo_data["objects"], object_name: {**topo_data["objects"][object_name], "geometries": geometries}}
+    return {**topo_data, "objects": objects}
 
 
 def create_average_map(
     bydel_gdf: gpd.GeoDataFrame,
     avg_df: pd.DataFrame,
-    output_path: str = "average_map.html"
-):
-    """Create choropleth map showing average lighting energy usage per bydel."""
+    output_path: PathLike = "average_map.html",
+    topojson_data: Optional[dict] = None,
+) -> Path:
+    """Create choropleth map showing average lighting energy usage per bydel.
+
+    Pass topojson_data (e.g. from load_simplified_bydeler_topojson) to embed the
+    districts as TopoJSON instead of GeoJSON from bydel_gdf. A relative
+    output_path is saved under FIGURE_DIR; the saved path is returned.
+    """
+    import folium
+    from branca.colormap import LinearColormap
 
     # Merge geodata with average data
     gdf = bydel_gdf.merge(
@@ -75,23 +160,29 @@ def create_average_map(
     )
 
     # Add choropleth
-    folium.GeoJson(
-        gdf,
-        style_function=lambda feature: {
-            "fillColor": colormap(feature["properties"]["forbruk_kwh"])
-            if feature["properties"].get("forbruk_kwh") is not None
-            else "lightgray",
-            "color": "black",
-            "weight": 1.5,
-            "fillOpacity": 0.75,
-        },
-        tooltip=folium.GeoJsonTooltip(
-            fields=["BYDELSNAVN", "forbruk_kwh"],
-            aliases=["Bydel:", "Gjennomsnittlig forbruk (kWh):"],
-            localize=True,
-            labels=True,
-        ),
-    ).add_to(m)
+    style_function = lambda feature: {
+        "fillColor": colormap(feature["properties"]["forbruk_kwh"])
+        if feature["properties"].get("forbruk_kwh") is not None
+        else "lightgray",
+        "color": "black",
+        "weight": 1.5,
+        "fillOpacity": 0.75,
+    }
+    tooltip = folium.GeoJsonTooltip(
+        fields=["BYDELSNAVN", "forbruk_kwh"],
+        aliases=["Bydel:", "Gjennomsnittlig forbruk (kWh):"],
+        localize=True,
+        labels=True,
+    )
+    if topojson_data is not None:
+        folium.TopoJson(
+            attach_properties_to_topojson(topojson_data, avg_df[["Bydel", "forbruk_kwh"]], "BYDELSNAVN", "Bydel"),
+            object_path="objects.Bydeler",
+            style_function=style_function,
+            tooltip=tooltip,
+        ).add_to(m)
+    else:
+        folium.GeoJson(gdf, style_function=style_function, tooltip=tooltip).add_to(m)
 
     colormap.add_to(m)
 
@@ -107,91 +198,82 @@ def create_average_map(
     """
     m.get_root().html.add_child(folium.Element(title_html))
 
+    output_path = output_file(output_path)
     m.save(output_path)
+    return output_path
+
+HISTOGRAM_PANELS = [
+    ('Belysning', 'Belysning', 'skyblue'),
+    ('Trafikkstyring', 'Trafikklys', 'orange'),
+    ('P-automater', 'Parkering', 'green'),
+    ('Ladestasjoner', 'Ladestasjoner', 'red'),
+]
+
+BOXPLOT_PANELS = [
+    ('Belysning', 'skyblue'),
+    ('Trafikkstyring', 'orange'),
+    ('P-automater', 'green'),
+    ('Ladestasjoner', 'red'),
+]
+
+MONTH_ORDER = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+               'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
 
-def histogram_per_kategori(dataframe: pd.DataFrame):
+def histogram_per_kategori(dataframe: pd.DataFrame, output_path: Optional[PathLike] = None) -> plt.Figure:
+    summary = histogram_summary(dataframe, [kategori for kategori, _, _ in HISTOGRAM_PANELS])
+    return plot_histogram_summary(summary, output_path)
+
+
+def plot_histogram_summary(summary: pd.DataFrame, output_path: Optional[PathLike] = None) -> plt.Figure:
+    """Draw the per-kategori histograms from histogram_summary counts."""
     fig, axes = plt.subplots(2, 2, figsize=(14, 10))
-    belysining_df = dataframe[dataframe['kategori'] == 'Belysning']
-    traffic_df = dataframe[dataframe['kategori'] == 'Trafikkstyring']
-    parkering_df = dataframe[dataframe['kategori'] == 'P-automater']
-    ladestasjoner_df = dataframe[dataframe['kategori'] == 'Ladestasjoner']
-    # Belysning (top left)
-    axes[0, 0].hist(belysining_df['forbruk_kwh'].dropna(), bins=50, 
-                    color='skyblue', edgecolor='black', alpha=0.7)
-    axes[0, 0].set_xlabel('Forbruk (kWh)')
-    axes[0, 0].set_ylabel('Antall observasjoner')
-    axes[0, 0].set_title('Belysning')
-    axes[0, 0].set_xlim(0, 15000)
-    axes[0, 0].grid(axis='y', alpha=0.3)
-
-    # Trafikklys (top right)
-    axes[0, 1].hist(traffic_df['forbruk_kwh'].dropna(), bins=100, 
-                    color='orange', edgecolor='black', alpha=0.7)
-    axes[0, 1].set_xlabel('Forbruk (kWh)')
-    axes[0, 1].set_ylabel('Antall observasjoner')
-    axes[0, 1].set_title('Trafikklys')
-    axes[0, 1].set_xlim(0, 15000)
-    axes[0, 1].grid(axis='y', alpha=0.3)
-
-    # Parkering (bottom left)
-    axes[1, 0].hist(parkering_df['forbruk_kwh'].dropna(), bins=100, 
-                    color='green', edgecolor='black', alpha=0.7)
-    axes[1, 0].set_xlabel('Forbruk (kWh)')
-    axes[1, 0].set_ylabel('Antall observasjoner')
-    axes[1, 0].set_title('Parkering')
-    axes[1, 0].set_xlim(0, 15000)
-    axes[1, 0].grid(axis='y', alpha=0.3)
-
-    # Ladestasjoner (bottom right)
-    axes[1, 1].hist(ladestasjoner_df['forbruk_kwh'].dropna(), bins=100, 
-                    color='red', edgecolor='black', alpha=0.7)
-    axes[1, 1].set_xlabel('Forbruk (kWh)')
-    axes[1, 1].set_ylabel('Antall observasjoner')
-    axes[1, 1].set_title('Ladestasjoner')
-    axes[1, 1].set_xlim(0, 15000)
-    axes[1, 1].grid(axis='y', alpha=0.3)
-
-    plt.tight_layout()
-    plt.show()
-
-def boxplot_per_kategori_per_month(dataframe: pd.DataFrame):
-    # Legg til måned-kolonne
-    dataframe['month'] = pd.to_datetime(dataframe['dato']).dt.month
-    dataframe['month_name'] = pd.to_datetime(dataframe['dato']).dt.strftime('%b')
-    
-    month_order = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 
-                   'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    
+    for ax, (kategori, title, color) in zip(axes.flat, HISTOGRAM_PANELS):
+        bins = summary[summary['kategori'] == kategori]
+        if len(bins):
+            edges = np.append(bins['bin_left'].to_numpy(), bins['bin_right'].iloc[-1])
+            ax.hist(bins['bin_left'], bins=edges, weights=bins['count'],
+                    color=color, edgecolor='black', alpha=0.7)
+        ax.set_xlabel('Forbruk (kWh)')
+        ax.set_ylabel('Antall observasjoner')
+        ax.set_title(title)
+        ax.set_xlim(0, 15000)
+        ax.grid(axis='y', alpha=0.3)
+
+    return finish_figure(fig, output_path)
+
+
+def boxplot_per_kategori_per_month(dataframe: pd.DataFrame, output_path: Optional[PathLike] = None) -> plt.Figure:
+    return plot_boxplot_summary(boxplot_summary(dataframe), output_path)
+
+
+def plot_boxplot_summary(summary: pd.DataFrame, output_path: Optional[PathLike] = None) -> plt.Figure:
+    """Draw monthly boxplots per kategori from boxplot_summary rows, without fliers."""
     fig, axes = plt.subplots(2, 2, figsize=(16, 12))
-    
-    categories = [
-        ('Belysning', 'skyblue'),
-        ('Trafikkstyring', 'orange'),
-        ('P-automater', 'green'),
-        ('Ladestasjoner', 'red')
-    ]
-    
-    for idx, (category, color) in enumerate(categories):
-        row = idx // 2
-        col = idx % 2
-        
-        category_df = dataframe[dataframe['kategori'] == category]
-        
-        # Boxplot per måned
-        sns.boxplot(data=category_df, x='month_name', y='forbruk_kwh', 
-                    order=month_order, ax=axes[row, col], color=color)
-        
-        axes[row, col].set_xlabel('Måned', fontsize=11, fontweight='bold')
-        axes[row, col].set_ylabel('Forbruk (kWh)', fontsize=11, fontweight='bold')
-        axes[row, col].set_title(f'{category} - Forbruk per måned', 
-                                 fontsize=12, fontweight='bold')
-        axes[row, col].tick_params(axis='x', rotation=45)
-        axes[row, col].grid(axis='y', alpha=0.3)
-    
-    plt.tight_layout()
-    plt.show()
-
-def create_barplot_percent_total_observations_category(dataframe: pd.DataFrame):
+
+    for ax, (category, color) in zip(axes.flat, BOXPLOT_PANELS):
+        rows = summary[summary['kategori'] == category].sort_values('month')
+        stats = [
+            {'med': r.med, 'q1': r.q1, 'q3': r.q3, 'whislo': r.whislo, 'whishi': r.whishi}
+            for r in rows.itertuples()
+        ]
+        if stats:
+            ax.bxp(stats, positions=rows['month'].to_numpy(), showfliers=False, patch_artist=True,
+                   boxprops={'facecolor': color}, medianprops={'color': 'black'})
+        ax.set_xticks(range(1, 13), MONTH_ORDER)
+
+        ax.set_xlabel('Måned', fontsize=11, fontweight='bold')
+        ax.set_ylabel('Forbruk (kWh)', fontsize=11, fontweight='bold')
+        ax.set_title(f'{category} - Forbruk per måned', fontsize=12, fontweight='bold')
+        ax.tick_params(axis='x', rotation=45)
+        ax.grid(axis='y', alpha=0.3)
+
+    return finish_figure(fig, output_path)
+
+def create_barplot_percent_total_observations_category(
+    dataframe: pd.DataFrame,
+    output_path: Optional[PathLike] = 'kategori_prosent_bar.png',
+) -> plt.Figure:
     count_by_kategori = dataframe['kategori'].value_counts()
     count_by_kategori_percent = (count_by_kategori / len(dataframe)) * 100
     count_by_kategori_percent = count_by_kategori_percent.sort_values(ascending=False)
@@ -237,6 +319,4 @@ def create_barplot_percent_total_observations_category(dataframe: pd.DataFrame):
     # Set y-axis to show percentages nicely
     ax.set_ylim(0, max(count_by_kategori_percent.values) * 1.1)
 
-    plt.tight_layout()
-    plt.savefig('kategori_prosent_bar.png', dpi=300, bbox_inches='tight')
-    plt.show()
\ No newline at end of file
+    return finish_figure(fig, output_path)
@@ -0,0 +1,125 @@
+from typing import Dict, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+
+def station_key(source_ids: pd.Series) -> pd.Series:
+    """Frost station id without the sensor suffix, e.g. 'SN18700:0' -> 'SN18700'."""
+    return source_ids.astype(str).str.split(':', n=1).str[0]
+
+
+def attach_nearest_station(
+    df: pd.DataFrame,
+    allocated_stations: Dict[str, dict],
+    default_station: Optional[str] = None,
+    address_column: str = 'addresse',
+) -> pd.DataFrame:
+    """Add the station_id allocate_clostest_weather_station chose for each row's address.
+
+    The mapping is resolved once per distinct address and broadcast through the
+    category codes. Rows without an address or station get default_station.
+    """
+    stations = pd.Series({a: s.get('station_id') for a, s in allocated_stations.items()}, dtype=object)
+    addresses = df[address_column].astype('category')
+    # The trailing entry serves rows with a missing addresse (category code -1)
+    per_address = pd.concat([stations.reindex(addresses.cat.categories), pd.Series([None])], ignore_index=True)
+    if default_station is not None:
+        per_address = per_address.fillna(default_station)
+    codes, uniques = pd.factorize(per_address)
+    df = df.copy()
+    df['station_id'] = pd.Categorical.from_codes(codes[addresses.cat.codes.to_numpy()], categories=uniques)
+    return df
+
+
+class StationWeather:
+    """Weather observations held per station as sorted time and value arrays.
+
+    Lookups go through np.searchsorted on each station's slice, so joining
+    millions of consumption rows never materialises a many-to-many merge.
+    """
+
+    def __init__(
+        self,
+        weather: pd.DataFrame,
+        value_columns: Sequence[str],
+        station_column: str = 'sourceId',
+        time_column: str = 'referenceTime',
+        period_freq: Optional[str] = None,
+    ):
+        source_ids = weather[station_column].astype('category')
+        category_codes, self.stations = pd.factorize(station_key(source_ids.cat.categories.to_series()), sort=True)
+        # Rows without a source get code -1 and are dropped
+        codes = np.append(category_codes, -1)[source_ids.cat.codes.to_numpy()]
+        times = pd.to_datetime(weather[time_column])
+        if period_freq is not None:
+            times = times.dt.to_period(period_freq).dt.start_time
+        self.value_columns = list(value_columns)
+        self.period_freq = period_freq
+        # Sensors of one station (SN18700:0, SN18700:1) report different elements in separate
+        # rows, so collapse to one row per station and time with the first non-NaN value of each
+        collapsed = (
+            weather[self.value_columns].astype(float)
+            .assign(_code=codes, _time=times.to_numpy(dtype='datetime64[ns]'))
+            .loc[codes >= 0]
+            .groupby(['_code', '_time'], sort=True)[self.value_columns].first()
+        )
+        station_codes = collapsed.index.get_level_values('_code').to_numpy()
+        self.times = collapsed.index.get_level_values('_time').to_numpy(dtype='datetime64[ns]')
+        self.values = collapsed.to_numpy(dtype=float)
+        # Rows of station i are self.times[self.offsets[i]:self.offsets[i + 1]]
+        self.offsets = np.searchsorted(station_codes, np.arange(len(self.stations) + 1))
+
+    def lookup(
+        self,
+        station_ids: Sequence,
+        times: Sequence,
+        how: str = 'exact',
+        tolerance: Optional[pd.Timedelta] = None,
+    ) -> pd.DataFrame:
+        """Weather values per (station, time) query, NaN where there is no match.
+
+        how='exact' matches the observation at that time (or period when the index
+        was built with period_freq); how='backward' takes the latest observation at
+        or before it, like merge_asof, optionally no older than tolerance.
+        """
+        query_times = pd.to_datetime(pd.Series(times))
+        if self.period_freq is not None:
+            query_times = query_times.dt.to_period(self.period_freq).dt.start_time
+        query_times = query_times.to_numpy(dtype='datetime64[ns]')
+        # Resolve each distinct station id once, then broadcast through the category codes
+        station_ids = pd.Series(station_ids).astype('category')
+        category_codes = self.stations.get_indexer(station_key(station_ids.cat.categories.to_series()))
+        station_codes = np.append(category_codes, -1)[station_ids.cat.codes.to_numpy()]
+
+        result = np.full((len(query_times), len(self.value_columns)), np.nan)
+        for code in np.unique(station_codes[station_codes >= 0]):
+            rows = np.flatnonzero(station_codes == code)
+            start, stop = self.offsets[code], self.offsets[code + 1]
+            station_times = self.times[start:stop]
+            if how == 'exact':
+                idx = np.searchsorted(station_times, query_times[rows], side='left')
+                found = idx < len(station_times)
+                found[found] &= station_times[idx[found]] == query_times[rows][found]
+            elif how == 'backward':
+                idx = np.searchsorted(station_times, query_times[rows], side='right') - 1
+                found = idx >= 0
+                if tolerance is not None:
+                    found[found] &= query_times[rows][found] - station_times[idx[found]] <= pd.Timedelta(tolerance).to_timedelta64()
+            else:
+                raise ValueError(f"how must be 'exact' or 'backward', not {how!r}")
+            result[rows[found]] = self.values[start + idx[found]]
+        return pd.DataFrame(result, columns=self.value_columns)
+
+
+def attach_station_weather(
+    df: pd.DataFrame,
+    station_weather: StationWeather,
+    time_column: str,
+    station_column: str = 'station_id',
+    how: str = 'exact',
+    tolerance: Optional[pd.Timedelta] = None,
+) -> pd.DataFrame:
+    """Add each row's weather from its own station at its own time, see StationWeather.lookup."""
+    weather = station_weather.lookup(df[station_column], df[time_column], how=how, tolerance=tolerance)
+    weather.index = df.index
+    return pd.concat([df, weather], axis=1)